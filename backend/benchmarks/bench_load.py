@@ -0,0 +1,331 @@
+"""Drive the backend's hot paths at scale against local stand-ins and report
+p50/p99 latency and event-loop stalls per scenario.
+
+    prisma generate  # once, from backend/
+    python benchmarks/bench_load.py [--paths 1000] [--recorders 100] [--recordings 500]
+                                    [--concurrency 100] [--rounds 20] [--latency 2]
+
+Everything lives under --dir: a SQLite database built from migrations/, the
+state store and recordings catalog, and hard links to one generated fMP4
+fixture standing in for every segment. MediaMTX, Slack and GitHub are served
+by fake_upstream.py in a separate process, so their work doesn't count as
+backend event-loop time.
+
+Scenarios:
+    startup          lifespan startup, incl. the MediaMTX path reconcile
+    catalog_sync     first full scan of --recorders x --recordings segments
+    check_for_new    one reconcile tick while a tenth of the paths flap
+    update_active    one focus rotation with every path live
+    status_cold      --concurrency concurrent /onboard-live-status, unprobed
+    status_warm      the same again, durations now catalogued
+    github_callback  --concurrency concurrent OAuth callbacks listing sessions
+    leaderboard      --concurrency concurrent leaderboard pages
+    submit_sessions  --concurrency concurrent session submissions
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fixtures import synthetic_fmp4  # noqa: E402
+
+
+class LoopMonitor:
+    """Sleeps in short ticks; any time a tick wakes late the loop was blocked."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stalls = []
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            late = time.perf_counter() - started - self.interval
+            if late > 0.001:
+                self.stalls.append(late)
+
+    def take(self):
+        stalls, self.stalls = self.stalls, []
+        return stalls
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def report(name, latencies, stalls):
+    if not latencies:
+        print(f"{name:>16}: no samples")
+        return
+    print(
+        f"{name:>16}: n={len(latencies):<4} p50 {percentile(latencies, 50) * 1000:9.1f} ms"
+        f"  p99 {percentile(latencies, 99) * 1000:9.1f} ms"
+        f"  max {max(latencies) * 1000:9.1f} ms"
+        f" | loop stalls {len(stalls):4d}, max {max(stalls, default=0) * 1000:7.1f} ms,"
+        f" total {sum(stalls) * 1000:8.1f} ms"
+    )
+
+
+async def timed(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_database(path: str):
+    conn = sqlite3.connect(path)
+    migrations = os.path.join(BACKEND, "migrations")
+    for name in sorted(os.listdir(migrations)):
+        script = os.path.join(migrations, name, "migration.sql")
+        if os.path.exists(script):
+            with open(script) as f:
+                conn.executescript(f.read())
+    conn.close()
+
+
+def build_recordings(root: str, fixture: str, keys, per_stream: int):
+    start = datetime(2024, 8, 1, 12)
+    for key in keys:
+        directory = os.path.join(root, key)
+        os.makedirs(directory, exist_ok=True)
+        for i in range(per_stream):
+            name = (start + timedelta(minutes=i)).strftime("%Y-%m-%d_%H-%M-%S-%f")
+            os.link(fixture, os.path.join(directory, f"{name}.mp4"))
+
+
+async def seed(url: str, keys, recorders: int):
+    from prisma import Prisma
+
+    db = Prisma(datasource={"url": url})
+    await db.connect()
+    await db.user.create_many(
+        data=[
+            {"id": f"user{i:04d}", "slack_id": f"U{i:06d}", "name": f"Streamer {i}"}
+            for i in range(len(keys))
+        ]
+    )
+    await db.stream.create_many(
+        data=[
+            {"id": f"stream-row{i:04d}", "key": key, "user_id": f"user{i:04d}"}
+            for i, key in enumerate(keys)
+        ]
+    )
+    await db.pullrequest.create_many(
+        data=[
+            {"github_id": 1000 + i, "user_id": f"user{i:04d}", "gh_user_id": 5000 + i}
+            for i in range(recorders)
+        ]
+    )
+    await db.disconnect()
+
+
+async def run(args):
+    import httpx
+
+    if os.path.exists(args.dir):
+        shutil.rmtree(args.dir)
+    os.makedirs(os.path.join(args.dir, "db"))
+    recordings = os.path.join(args.dir, "recordings")
+    fixture = os.path.join(args.dir, "fixture.mp4")
+    with open(fixture, "wb") as f:
+        f.write(synthetic_fmp4(60.0))
+
+    keys = [f"stream{i:04d}" for i in range(args.paths)]
+    recorder_keys = keys[: args.recorders]
+    database = os.path.join(args.dir, "db", "dev.db")
+    build_database(database)
+    build_recordings(recordings, fixture, recorder_keys, args.recordings)
+
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    upstream = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(os.path.dirname(__file__), "fake_upstream.py"),
+            "--port", str(port),
+            "--paths", "0",
+            "--latency", str(args.latency),
+        ]
+    )
+    control = httpx.AsyncClient(base_url=base)
+    try:
+        for _ in range(100):
+            try:
+                await control.get("/bench/calls")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        await control.post("/bench/paths", json={"replace": True, "ready": {k: True for k in keys}})
+
+        os.environ.update(
+            {
+                "MEDIAMTX_URL": base,
+                "SLACK_API_URL": f"{base}/api/",
+                "GITHUB_URL": base,
+                "GITHUB_API_URL": base,
+                "DATABASE_URL": f"file:{database}",
+                "STATE_URL": f"sqlite:///{os.path.join(args.dir, 'db', 'state.db')}",
+                "RECORDINGS_ROOT": recordings,
+                "SLACK_TOKEN": "xoxb-bench",
+                "SLACK_SIGNING_SECRET": "bench",
+                "GH_CLIENT_ID": "bench",
+                "GH_CLIENT_SECRET": "bench",
+                "GH_HOOK_SECRET": "bench",
+                "ADMIN_SLACK_ID": "U000000",
+                # keep scheduled jobs out of the measurements
+                "FOCUS_SLOT_SECONDS": "86400",
+                "RECONCILE_SECONDS": "86400",
+                "RECONCILE_IN_BACKGROUND": "0",
+            }
+        )
+        await seed(f"file:{database}", keys, args.recorders)
+        os.chdir(args.dir)  # main keeps its state under ./db
+        import catalog
+        import main
+
+        monitor = LoopMonitor()
+        watcher = asyncio.create_task(monitor.run())
+
+        prefill = catalog.RecordingCatalog(os.path.join(args.dir, "db", "recordings.db"))
+        prefill.connect()
+        elapsed = await timed(asyncio.to_thread(prefill.sync, catalog.scan(recordings)))
+        prefill.disconnect()
+        report("catalog_sync", [elapsed], monitor.take())
+
+        lifespan = main.lifespan(main.api)
+        report("startup", [await timed(lifespan.__aenter__())], monitor.take())
+        try:
+            latencies = []
+            for _ in range(args.rounds):
+                flapping = random.sample(keys, max(1, len(keys) // 10))
+                await control.post(
+                    "/bench/paths", json={"ready": {k: random.random() < 0.5 for k in flapping}}
+                )
+                latencies.append(await timed(main.check_for_new()))
+            report("check_for_new", latencies, monitor.take())
+
+            await control.post("/bench/paths", json={"ready": {k: True for k in keys}})
+            await main.check_for_new()
+            monitor.take()
+            latencies = [await timed(main.update_active()) for _ in range(args.rounds)]
+            report("update_active", latencies, monitor.take())
+
+            async def ack(*_args, **_kwargs):
+                pass
+
+            def status(i):
+                return main.status_command(
+                    ack, {"user_id": f"U{i:06d}", "channel_id": "C000000", "text": ""}
+                )
+
+            users = [i % args.recorders for i in range(args.concurrency)]
+            for name in ("status_cold", "status_warm"):
+                latencies = await asyncio.gather(*[timed(status(i)) for i in users])
+                report(name, latencies, monitor.take())
+
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=main.api), base_url="http://backend"
+            )
+
+            async def callback(i):
+                state = await main.keyring.encrypt(f"U{i:06d}+{1000 + i}".encode(), ttl=3600)
+                response = await client.get(
+                    "/auth/github/callback",
+                    params={"code": str(5000 + i), "state": state.hex()},
+                )
+                if response.status_code != 200:
+                    raise RuntimeError(f"github_callback returned {response.status_code}")
+
+            latencies = await asyncio.gather(*[timed(callback(i)) for i in users])
+            report("github_callback", latencies, monitor.take())
+
+            async def leaderboard(i):
+                response = await client.get(
+                    "/api/v1/leaderboard", params={"limit": 25, "offset": i % 4 * 25}
+                )
+                if response.status_code != 200:
+                    raise RuntimeError(f"leaderboard returned {response.status_code}")
+
+            latencies = await asyncio.gather(*[timed(leaderboard(i)) for i in users])
+            report("leaderboard", latencies, monitor.take())
+            await client.aclose()
+
+            def submission(i):
+                recs = sorted(os.listdir(os.path.join(recordings, keys[i])))[: args.sessions]
+                lines = [
+                    datetime.strptime(r[:-4], catalog.FILENAME_FORMAT).strftime(catalog.START_FORMAT)
+                    + " for 1 minutes"
+                    for r in recs
+                ]
+                return {
+                    "state": {
+                        "values": {
+                            "session-input": {"plain_text_input-action": {"value": "\n".join(lines)}}
+                        }
+                    },
+                    "message": {
+                        "ts": "1.000001",
+                        "blocks": [
+                            {},
+                            {"text": {"text": f"Select the ones associated with OnBoard pull request #{1000 + i}:"}},
+                        ],
+                    },
+                    "container": {"channel_id": f"DU{i:06d}"},
+                }
+
+            # sheets render after submit_sessions returns and would only
+            # load the machine while it's being measured
+            main.sheets.schedule = lambda recording: None
+            bodies = [submission(i) for i in users]
+            latencies = await asyncio.gather(
+                *[timed(main.submit_sessions(ack, body)) for body in bodies]
+            )
+            report("submit_sessions", latencies, monitor.take())
+        finally:
+            await lifespan.__aexit__(None, None, None)
+            watcher.cancel()
+        calls = (await control.get("/bench/calls")).json()
+        print("upstream calls: " + ", ".join(f"{k} {v}" for k, v in sorted(calls.items())))
+    finally:
+        await control.aclose()
+        upstream.terminate()
+        upstream.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paths", type=int, default=1000)
+    parser.add_argument("--recorders", type=int, default=100)
+    parser.add_argument("--recordings", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=50, help="sessions per submission")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=2.0, help="upstream latency, ms")
+    parser.add_argument("--dir", default="/tmp/onboard-load")
+    args = parser.parse_args()
+    args.recorders = min(args.recorders, args.paths)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
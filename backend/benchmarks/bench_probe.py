@@ -0,0 +1,61 @@
+"""Compare the box-header duration probe against OpenCV on a segment directory.
+
+    python benchmarks/bench_probe.py [--count 200] [--seconds 60] [--dir /tmp/onboard-bench]
+
+Segments are made with ffmpeg when it is installed; otherwise header-only
+synthetic fMP4 files are written and the OpenCV side is skipped, since it
+cannot open files without real codec data.
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import mp4probe  # noqa: E402
+from fixtures import make_segments  # noqa: E402
+
+
+def cv2_duration(path: str) -> float:
+    import cv2
+
+    vid = cv2.VideoCapture(path)
+    try:
+        fps = vid.get(cv2.CAP_PROP_FPS)
+        return vid.get(cv2.CAP_PROP_FRAME_COUNT) / fps if fps else 0.0
+    finally:
+        vid.release()
+
+
+def run(name, probe, paths):
+    start = time.perf_counter()
+    total = sum(probe(path) for path in paths)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>8}: {elapsed * 1000:9.1f} ms total, "
+        f"{elapsed / len(paths) * 1e6:9.1f} us/segment, {total / 60:.1f} min of footage"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--dir", default="/tmp/onboard-bench/segments")
+    args = parser.parse_args()
+
+    paths = make_segments(args.dir, args.count, args.seconds)
+    mp4 = run("mp4probe", mp4probe.duration, paths)
+    if importlib.util.find_spec("cv2") is None:
+        print("  opencv: not installed, skipping")
+        return
+    cv = run("opencv", cv2_duration, paths)
+    print(f" speedup: {cv / mp4:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
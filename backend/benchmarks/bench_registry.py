@@ -0,0 +1,84 @@
+"""Time one presence-reconciliation tick with the old list-of-dicts state
+against StreamRegistry, at 10/100/1,000 simultaneous live paths. Tick times
+include building the starting state, since each tick mutates it.
+
+    python benchmarks/bench_registry.py
+"""
+
+import os
+import sys
+import timeit
+from random import choice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from registry import StreamRegistry  # noqa: E402
+
+
+def list_tick(active_streams, live):
+    # the body of the old check_for_new, minus the HTTP call
+    active_stream = {}
+    active_streams_simple = []
+    for i in active_streams:
+        active_streams_simple.append(i["name"])
+        if active_stream == {}:
+            active_stream = {"name": i["name"], "ready": True}
+    for stream in active_streams_simple:
+        if stream not in live:
+            active_streams.remove(
+                next(item for item in active_streams if item["name"] == stream)
+            )
+            active_stream = choice(active_streams)
+    for stream in live:
+        if stream not in active_streams_simple:
+            active_streams.append({"name": stream, "ready": True})
+
+
+def registry_tick(registry, live):
+    live_set = set(live)
+    known = set(registry.names())
+    for name in known - live_set:
+        registry.remove(name)
+    for name in live_set - known:
+        registry.add(name)
+    registry.snapshot()
+
+
+def main():
+    for n in (10, 100, 1000):
+        names = [f"stream{i:05d}" for i in range(n)]
+        # a tenth of the streams churn each tick
+        before, after = names[: n - n // 10], names[n // 10 :]
+        number = max(1, 20000 // n)
+
+        def run_list():
+            streams = [{"name": name, "ready": True} for name in before]
+            list_tick(streams, after)
+
+        def run_registry():
+            registry = StreamRegistry()
+            for name in before:
+                registry.add(name)
+            registry_tick(registry, after)
+
+        old = min(timeit.repeat(run_list, number=number, repeat=3)) / number
+        new = min(timeit.repeat(run_registry, number=number, repeat=3)) / number
+
+        streams = [{"name": name, "ready": True} for name in names]
+        registry = StreamRegistry()
+        for name in names:
+            registry.add(name)
+        key = names[-1]
+        old_lookup = min(timeit.repeat(
+            lambda: {"name": key, "ready": True} in streams, number=1000, repeat=3
+        )) / 1000
+        new_lookup = min(timeit.repeat(lambda: key in registry, number=1000, repeat=3)) / 1000
+        print(
+            f"{n:>5} paths: tick list {old * 1e6:9.1f} us, registry {new * 1e6:7.1f} us "
+            f"({old / new:5.1f}x) | lookup list {old_lookup * 1e9:8.0f} ns, "
+            f"registry {new_lookup * 1e9:4.0f} ns"
+        )
+
+
+if __name__ == "__main__":
+    main()
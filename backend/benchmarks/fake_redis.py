@@ -0,0 +1,102 @@
+"""In-memory stand-in for a Redis server, enough for state.RedisStateStore.
+
+    python benchmarks/fake_redis.py [--port 6390]
+    STATE_URL=redis://localhost:6390 uvicorn main:api --workers 4
+"""
+
+import argparse
+import asyncio
+import time
+from collections import deque
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+        self.lists = {}
+
+    def _alive(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.values.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.values
+
+    def execute(self, args):
+        command = args[0].upper()
+        if command in ("PING", "SELECT", "AUTH"):
+            return "+OK" if command != "PING" else "+PONG"
+        if command == "GET":
+            return self.values[args[1]] if self._alive(args[1]) else None
+        if command == "SET":
+            key, value, options = args[1], args[2], [a.upper() for a in args[3:]]
+            exists = self._alive(key)
+            if ("NX" in options and exists) or ("XX" in options and not exists):
+                return None
+            self.values[key] = value
+            self.expires.pop(key, None)
+            if "PX" in options:
+                self.expires[key] = time.monotonic() + int(args[3 + options.index("PX") + 1]) / 1000
+            return "+OK"
+        if command == "DEL":
+            removed = sum(
+                1 for key in args[1:]
+                if self.values.pop(key, None) is not None or self.lists.pop(key, None) is not None
+            )
+            return removed
+        if command == "RPUSH":
+            items = self.lists.setdefault(args[1], deque())
+            items.extend(args[2:])
+            return len(items)
+        if command == "LPOP":
+            items = self.lists.get(args[1])
+            return items.popleft() if items else None
+        return RuntimeError(f"unknown command '{command}'")
+
+
+def encode(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, RuntimeError):
+        return f"-ERR {reply}\r\n".encode()
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if reply.startswith("+"):
+        return f"{reply}\r\n".encode()
+    data = reply.encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+async def serve(host: str = "127.0.0.1", port: int = 6390) -> asyncio.Server:
+    redis = FakeRedis()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                header = await reader.readline()
+                if not header:
+                    break
+                args = []
+                for _ in range(int(header[1:-2])):
+                    length = int((await reader.readline())[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2].decode())
+                writer.write(encode(redis.execute(args)))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def main(port: int):
+    server = await serve(port=port)
+    print(f"fake redis listening on 127.0.0.1:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=6390)
+    asyncio.run(main(parser.parse_args().port))
@@ -0,0 +1,147 @@
+"""Stand-ins for the MediaMTX control API, the Slack Web API and GitHub's
+OAuth endpoints, all served from one port.
+
+    python benchmarks/fake_upstream.py [--port 9997] [--paths 1000] [--latency 0]
+    MEDIAMTX_URL=http://localhost:9997 SLACK_API_URL=http://localhost:9997/api/ \\
+        GITHUB_URL=http://localhost:9997 GITHUB_API_URL=http://localhost:9997 uvicorn main:api
+
+Paths are stream0000..streamNNNN unless a benchmark replaces them through
+POST /bench/paths. Every response waits --latency milliseconds first, to
+stand in for the network round trip.
+"""
+
+import argparse
+import asyncio
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeUpstream:
+    def __init__(self, paths: int = 0, latency: float = 0.0):
+        self.latency = latency / 1000
+        self.ready = {f"stream{i:04d}": True for i in range(paths)}
+        self.bytes_received = {name: 0 for name in self.ready}
+        self.configs = set()
+        self.calls = Counter()
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.delay])
+        app.add_routes(
+            [
+                web.get("/v3/paths/list", self.paths_list),
+                web.get("/v3/config/paths/list", self.config_list),
+                web.post("/v3/config/paths/add/{name}", self.config_add),
+                web.delete("/v3/config/paths/delete/{name}", self.config_delete),
+                web.route("*", "/api/{method}", self.slack),
+                web.post("/login/oauth/access_token", self.github_token),
+                web.get("/user", self.github_user),
+                web.post("/bench/paths", self.set_paths),
+                web.get("/bench/calls", self.get_calls),
+            ]
+        )
+        return app
+
+    @web.middleware
+    async def delay(self, request, handler):
+        resource = request.match_info.route.resource
+        self.calls[resource.canonical if resource else request.path] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    def _page(self, request, items):
+        page = int(request.query.get("page", 0))
+        per_page = int(request.query.get("itemsPerPage", 100))
+        return web.json_response(
+            {
+                "pageCount": max(1, -(-len(items) // per_page)),
+                "itemCount": len(items),
+                "items": items[page * per_page : (page + 1) * per_page],
+            }
+        )
+
+    async def paths_list(self, request):
+        items = []
+        for name, ready in self.ready.items():
+            if ready:
+                # roughly 2.5 Mbit/s per publisher per poll
+                self.bytes_received[name] = self.bytes_received.get(name, 0) + 300_000
+            items.append(
+                {"name": name, "ready": ready, "bytesReceived": self.bytes_received.get(name, 0)}
+            )
+        return self._page(request, items)
+
+    async def config_list(self, request):
+        return self._page(request, [{"name": name} for name in sorted(self.configs)])
+
+    async def config_add(self, request):
+        name = request.match_info["name"]
+        if name in self.configs:
+            return web.json_response({"error": "path already exists"}, status=400)
+        self.configs.add(name)
+        return web.json_response({})
+
+    async def config_delete(self, request):
+        name = request.match_info["name"]
+        if name not in self.configs:
+            return web.json_response({"error": "path not found"}, status=404)
+        self.configs.discard(name)
+        return web.json_response({})
+
+    async def slack(self, request):
+        method = request.match_info["method"]
+        body = dict(request.query)
+        if request.content_type == "application/json":
+            body.update(await request.json())
+        elif request.method == "POST":
+            body.update(await request.post())
+        if method == "conversations.open":
+            return web.json_response({"ok": True, "channel": {"id": f"D{body.get('users', 'X')}"}})
+        if method == "users.info":
+            return web.json_response(
+                {"ok": True, "user": {"id": body.get("user"), "real_name": "Bench User"}}
+            )
+        if method.startswith("chat.post"):
+            return web.json_response({"ok": True, "channel": body.get("channel"), "ts": "1.000001"})
+        return web.json_response({"ok": True})
+
+    async def github_token(self, request):
+        body = await request.json()
+        return web.json_response({"access_token": f"bench-{body['code']}"})
+
+    async def github_user(self, request):
+        # the OAuth code is the GitHub user ID, so callers pick who they log in as
+        token = request.headers["Authorization"].removeprefix("Bearer bench-")
+        return web.json_response({"id": int(token)})
+
+    async def set_paths(self, request):
+        """{"ready": {name: bool}, "replace": bool}"""
+        body = await request.json()
+        if body.get("replace"):
+            self.ready = {}
+        self.ready.update(body.get("ready", {}))
+        return web.json_response({"paths": len(self.ready)})
+
+    async def get_calls(self, request):
+        return web.json_response(dict(self.calls))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9997)
+    parser.add_argument("--paths", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="milliseconds")
+    args = parser.parse_args()
+    web.run_app(
+        FakeUpstream(args.paths, args.latency).app(),
+        host=args.host,
+        port=args.port,
+        print=None,
+        access_log=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
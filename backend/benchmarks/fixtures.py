@@ -0,0 +1,95 @@
+import os
+import random
+import shutil
+import struct
+import subprocess
+
+
+def box(kind: bytes, *payload: bytes) -> bytes:
+    body = b"".join(payload)
+    return struct.pack(">I4s", 8 + len(body), kind) + body
+
+
+def full_box(kind: bytes, version: int, flags: int, *payload: bytes) -> bytes:
+    return box(kind, struct.pack(">I", (version << 24) | flags), *payload)
+
+
+def synthetic_fmp4(
+    seconds: float, fps: float = 30.0, timescale: int = 90000, vfr: bool = True
+) -> bytes:
+    """A header-only fragmented MP4 laid out like a MediaMTX segment.
+
+    The mdat payloads are zero-filled, so only box-level probes can read it.
+    With vfr=True every sample duration is jittered, as with OBS/WebRTC.
+    """
+    rng = random.Random(seconds)
+    nominal = int(timescale / fps)
+    moov = box(
+        b"moov",
+        full_box(b"mvhd", 0, 0, struct.pack(">IIII", 0, 0, 1000, 0), bytes(80)),
+        box(
+            b"trak",
+            full_box(b"tkhd", 0, 3, struct.pack(">III", 0, 0, 1), bytes(72)),
+            box(
+                b"mdia",
+                full_box(b"mdhd", 0, 0, struct.pack(">IIII", 0, 0, timescale, 0), bytes(4)),
+                full_box(b"hdlr", 0, 0, bytes(4), b"vide", bytes(13)),
+            ),
+        ),
+        box(b"mvex", full_box(b"trex", 0, 0, struct.pack(">IIIII", 1, 1, nominal, 0, 0))),
+    )
+    out = [box(b"ftyp", b"iso5", struct.pack(">I", 512), b"iso5iso6mp41"), moov]
+    total = int(seconds * timescale)
+    decode_time = 0
+    sequence = 1
+    while decode_time < total:
+        durations = []
+        while decode_time + sum(durations) < total and len(durations) < fps:
+            jitter = rng.randint(-nominal // 4, nominal // 4) if vfr else 0
+            durations.append(nominal + jitter)
+        # each fragment opens on a keyframe, like a GOP-aligned encoder
+        samples = b"".join(
+            struct.pack(">III", d, 64, 0x2000000 if i == 0 else 0x10000)
+            for i, d in enumerate(durations)
+        )
+        traf = box(
+            b"traf",
+            full_box(b"tfhd", 0, 0x20000, struct.pack(">I", 1)),
+            full_box(b"tfdt", 1, 0, struct.pack(">Q", decode_time)),
+            full_box(b"trun", 0, 0x701, struct.pack(">Ii", len(durations), 0), samples),
+        )
+        out.append(box(b"moof", full_box(b"mfhd", 0, 0, struct.pack(">I", sequence)), traf))
+        out.append(box(b"mdat", bytes(64 * len(durations))))
+        decode_time += sum(durations)
+        sequence += 1
+    return b"".join(out)
+
+
+def ffmpeg_segment(path: str, seconds: float):
+    subprocess.run(
+        [
+            "ffmpeg", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc=size=640x360:rate=30:duration={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-g", "60",
+            "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+            path,
+        ],
+        check=True,
+    )
+
+
+def make_segments(directory: str, count: int, seconds: float = 60.0) -> list[str]:
+    """Write count segments into directory, real ones if ffmpeg is available."""
+    os.makedirs(directory, exist_ok=True)
+    use_ffmpeg = shutil.which("ffmpeg") is not None
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"2024-08-01_12-{i // 60:02d}-{i % 60:02d}-000000.mp4")
+        if not os.path.exists(path):
+            if use_ffmpeg:
+                ffmpeg_segment(path, seconds)
+            else:
+                with open(path, "wb") as f:
+                    f.write(synthetic_fmp4(seconds))
+        paths.append(path)
+    return paths
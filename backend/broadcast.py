@@ -0,0 +1,44 @@
+import asyncio
+from typing import AsyncIterator
+
+
+class Broadcaster:
+    """Latest-value fan-out for server-sent events.
+
+    publish() encodes a frame once and wakes every subscriber through one
+    shared event. Subscribers always send the newest frame, so a slow client
+    skips versions it missed instead of buffering them.
+    """
+
+    def __init__(self, event: str = "snapshot", keepalive: float = 15.0):
+        self.event = event
+        self.keepalive = keepalive
+        self.version = -1
+        self.frame = b""
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+
+    def publish(self, version: int, data: str):
+        if version == self.version:
+            return
+        self.version = version
+        self.frame = f"id: {version}\nevent: {self.event}\ndata: {data}\n\n".encode()
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def subscribe(self, last_version: int = -1) -> AsyncIterator[bytes]:
+        self.subscribers += 1
+        try:
+            # tell EventSource how soon to reconnect if the connection drops
+            yield b"retry: 2000\n\n"
+            while True:
+                if self.frame and self.version != last_version:
+                    last_version = self.version
+                    yield self.frame
+                    continue
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"  # keeps proxies from closing an idle stream
+        finally:
+            self.subscribers -= 1
@@ -0,0 +1,357 @@
+import asyncio
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Iterable, List, Tuple
+
+import mp4probe
+from mp4probe import KeyframeIndex
+
+CATALOG_PATH = "./db/recordings.db"
+RECORDINGS_ROOT = os.environ.get("RECORDINGS_ROOT", "/recordings")
+# where the same recordings live on the host, as stored in Session.filename
+HOST_RECORDINGS_ROOT = "/home/onboard/recordings"
+FILENAME_FORMAT = "%Y-%m-%d_%H-%M-%S-%f"
+START_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+# insert a new file, or clear the probe results of one whose size or mtime changed
+UPSERT = """INSERT INTO recordings (path, stream_key, start, size, mtime_ns, seconds)
+    VALUES (?, ?, ?, ?, ?, NULL)
+    ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, seconds = NULL, keyframes = NULL
+    WHERE size != excluded.size OR mtime_ns != excluded.mtime_ns"""
+
+# per-stream segment count and probed seconds, kept current by triggers so
+# totals never need to scan a stream's recordings
+TOTALS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stream_totals (
+    stream_key TEXT PRIMARY KEY,
+    segments INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stream_totals_seconds ON stream_totals (seconds DESC);
+CREATE TRIGGER IF NOT EXISTS recordings_insert AFTER INSERT ON recordings BEGIN
+    INSERT INTO stream_totals (stream_key, segments, seconds)
+    VALUES (new.stream_key, 1, COALESCE(new.seconds, 0))
+    ON CONFLICT (stream_key) DO UPDATE SET
+        segments = segments + 1, seconds = seconds + COALESCE(new.seconds, 0);
+END;
+CREATE TRIGGER IF NOT EXISTS recordings_update AFTER UPDATE OF seconds ON recordings BEGIN
+    UPDATE stream_totals SET seconds = seconds - COALESCE(old.seconds, 0) + COALESCE(new.seconds, 0)
+    WHERE stream_key = new.stream_key;
+END;
+CREATE TRIGGER IF NOT EXISTS recordings_delete AFTER DELETE ON recordings BEGIN
+    UPDATE stream_totals SET segments = segments - 1, seconds = seconds - COALESCE(old.seconds, 0)
+    WHERE stream_key = old.stream_key;
+END;
+"""
+
+
+def parse_start(timestamp: str) -> datetime:
+    """A segment start in START_FORMAT, or as MediaMTX's API reports it
+    (RFC 3339 with trailing zeros, or the whole fraction, trimmed)."""
+    whole, _, fraction = timestamp.rstrip("Z").partition(".")
+    return datetime.strptime(f"{whole}.{fraction[:6]:0<6}Z", START_FORMAT)
+
+
+def recording_path(timestamp: str, stream_key: str, root: str = RECORDINGS_ROOT) -> str:
+    return f"{root}/{stream_key}/{parse_start(timestamp).strftime(FILENAME_FORMAT)}.mp4"
+
+
+def local_recording_path(filename: str) -> str:
+    """Where a Session.filename (a host path) is mounted in this container."""
+    if filename.startswith(HOST_RECORDINGS_ROOT + "/"):
+        return RECORDINGS_ROOT + filename[len(HOST_RECORDINGS_ROOT) :]
+    return filename
+
+
+def parse_recording_path(path: str) -> Tuple[str, str] | None:
+    """(stream key, start timestamp) for a MediaMTX segment path, else None."""
+    directory, filename = os.path.split(path)
+    stem, ext = os.path.splitext(filename)
+    if ext != ".mp4" or os.path.dirname(directory) != RECORDINGS_ROOT:
+        return None
+    try:
+        start = datetime.strptime(stem, FILENAME_FORMAT).strftime(START_FORMAT)
+    except ValueError:
+        return None
+    return os.path.basename(directory), start
+
+
+def probe(path: str) -> Tuple[int, int, float, str | None]:
+    """(size, mtime, seconds, keyframe index as JSON) for a recording."""
+    # stat before probing so a file that grows mid-probe gets re-probed later
+    st = os.stat(path)
+    movie = mp4probe.parse(path)
+    index = mp4probe.keyframe_index(movie)
+    keyframes = json.dumps([index.init_size, index.frames]) if index else None
+    return st.st_size, st.st_mtime_ns, mp4probe.movie_duration(movie), keyframes
+
+
+@dataclass
+class Recording:
+    path: str
+    stream_key: str
+    start: str
+    size: int
+    seconds: float | None  # None until probed, or after the file changed
+
+
+class RecordingCatalog:
+    """Every recording segment under /recordings, with its start, size and
+    duration, indexed by stream key.
+
+    Rows are keyed by path and carry the size and mtime the duration was
+    probed at; a watcher keeps them in sync with the filesystem and clears
+    the duration whenever a file changes, so it is never served stale.
+    """
+
+    def __init__(self, db_path: str = CATALOG_PATH):
+        self.db_path = db_path
+        self.lock = Lock()
+        self.conn: sqlite3.Connection
+
+    def connect(self):
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS recordings (
+                path TEXT PRIMARY KEY,
+                stream_key TEXT NOT NULL,
+                start TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                seconds REAL,
+                keyframes TEXT
+            )"""
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(recordings)")}
+        if "keyframes" not in columns:
+            self.conn.execute("ALTER TABLE recordings ADD COLUMN keyframes TEXT")
+            # probe everything again so it gets a keyframe index too
+            self.conn.execute("UPDATE recordings SET seconds = NULL WHERE keyframes IS NULL")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS recordings_stream_start ON recordings (stream_key, start)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS recordings_unprobed ON recordings (stream_key) WHERE seconds IS NULL"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS recordings_pending ON recordings (path) WHERE seconds IS NULL"
+        )
+        backfill = (
+            self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stream_totals'"
+            ).fetchone()
+            is None
+        )
+        self.conn.executescript(TOTALS_SCHEMA)
+        if backfill:
+            # catalog from before the triggers existed
+            self.conn.execute(
+                "INSERT INTO stream_totals SELECT stream_key, COUNT(*), COALESCE(SUM(seconds), 0) FROM recordings GROUP BY stream_key"
+            )
+        self.conn.commit()
+
+    def disconnect(self):
+        with self.lock:
+            self.conn.close()
+
+    def get(self, path: str) -> float | None:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.forget(path)
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, seconds FROM recordings WHERE path = ?",
+                (path,),
+            ).fetchone()
+        if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns:
+            return None
+        return row[2]
+
+    def store(
+        self,
+        path: str,
+        size: int,
+        mtime_ns: int,
+        seconds: float | None,
+        keyframes: str | None = None,
+    ):
+        parsed = parse_recording_path(path)
+        if parsed is None:
+            return
+        with self.lock:
+            # an upsert rather than INSERT OR REPLACE, whose implicit delete
+            # wouldn't fire the delete trigger
+            self.conn.execute(
+                """INSERT INTO recordings (path, stream_key, start, size, mtime_ns, seconds, keyframes) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns,
+                    seconds = excluded.seconds, keyframes = excluded.keyframes""",
+                (path, *parsed, size, mtime_ns, seconds, keyframes),
+            )
+            self.conn.commit()
+
+    def keyframes(self, path: str) -> KeyframeIndex | None:
+        """The stored keyframe index, or None if the file changed since it was
+        probed (or isn't a fragmented recording)."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, keyframes FROM recordings WHERE path = ?",
+                (path,),
+            ).fetchone()
+        if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns or row[2] is None:
+            return None
+        init_size, frames = json.loads(row[2])
+        return KeyframeIndex(init_size, [tuple(frame) for frame in frames])
+
+    def touch(self, path: str):
+        """Record a created or modified file, dropping its duration if it changed."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.forget(path)
+            return
+        parsed = parse_recording_path(path)
+        if parsed is None:
+            return
+        with self.lock:
+            self.conn.execute(UPSERT, (path, *parsed, st.st_size, st.st_mtime_ns))
+            self.conn.commit()
+
+    def forget(self, path: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM recordings WHERE path = ?", (path,))
+            self.conn.commit()
+
+    def sync(self, paths: Iterable[str]):
+        """Make the catalog match a full listing of the recordings directory,
+        in one transaction."""
+        with self.lock:
+            known = {
+                row[0]: (row[1], row[2])
+                for row in self.conn.execute("SELECT path, size, mtime_ns FROM recordings")
+            }
+        rows = []
+        seen = set()
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            seen.add(path)
+            if known.get(path) == (st.st_size, st.st_mtime_ns):
+                continue  # unchanged; skips parsing the name too
+            parsed = parse_recording_path(path)
+            if parsed is not None:
+                rows.append((path, *parsed, st.st_size, st.st_mtime_ns))
+        with self.lock:
+            self.conn.executemany(UPSERT, rows)
+            self.conn.executemany(
+                "DELETE FROM recordings WHERE path = ?",
+                [(path,) for path in known.keys() - seen],
+            )
+            self.conn.commit()
+
+    def list(self, stream_key: str, limit: int = -1, offset: int = 0) -> List[Recording]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, stream_key, start, size, seconds FROM recordings WHERE stream_key = ? ORDER BY start LIMIT ? OFFSET ?",
+                (stream_key, limit, offset),
+            ).fetchall()
+        return [Recording(*row) for row in rows]
+
+    def between(self, stream_key: str, start: str, end: str) -> List[Recording]:
+        """Segments of a stream that started in [start, end)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, stream_key, start, size, seconds FROM recordings WHERE stream_key = ? AND start >= ? AND start < ? ORDER BY start",
+                (stream_key, start, end),
+            ).fetchall()
+        return [Recording(*row) for row in rows]
+
+    def unprobed(self, stream_key: str) -> List[str]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path FROM recordings WHERE stream_key = ? AND seconds IS NULL",
+                (stream_key,),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def pending(self, after: str, limit: int) -> List[Tuple[str, str]]:
+        """(path, stream key) of up to limit recordings with no duration,
+        in path order after the given one, for probing in the background."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT path, stream_key FROM recordings WHERE seconds IS NULL AND path > ? ORDER BY path LIMIT ?",
+                (after, limit),
+            ).fetchall()
+
+    def totals(self, stream_key: str) -> Tuple[int, float]:
+        """(segment count, probed seconds) for a stream."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT segments, seconds FROM stream_totals WHERE stream_key = ?",
+                (stream_key,),
+            ).fetchone()
+        return (row[0], max(row[1], 0.0)) if row else (0, 0.0)
+
+    def ranking(self, limit: int, offset: int = 0) -> Tuple[int, List[Tuple[str, int, float]]]:
+        """(number of streams with recordings, one page of (stream key,
+        segment count, probed seconds) by most seconds first)."""
+        with self.lock:
+            (count,) = self.conn.execute(
+                "SELECT COUNT(*) FROM stream_totals WHERE segments > 0"
+            ).fetchone()
+            rows = self.conn.execute(
+                "SELECT stream_key, segments, seconds FROM stream_totals WHERE segments > 0 ORDER BY seconds DESC, stream_key LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return count, rows
+
+
+def scan(root: str = RECORDINGS_ROOT) -> List[str]:
+    paths = []
+    try:
+        streams = list(os.scandir(root))
+    except FileNotFoundError:
+        return paths
+    for stream in streams:
+        if not stream.is_dir():
+            continue
+        for entry in os.scandir(stream.path):
+            if entry.name.endswith(".mp4") and entry.is_file():
+                paths.append(entry.path)
+    return paths
+
+
+async def watch(catalog: RecordingCatalog, root: str = RECORDINGS_ROOT, rescan_every: float = 600.0):
+    """Keep the catalog in sync with root: inotify events as they happen, plus
+    a full rescan every rescan_every seconds in case any were dropped."""
+    try:
+        from watchfiles import Change, awatch
+    except ImportError:
+        awatch = None
+    while True:
+        await asyncio.to_thread(catalog.sync, await asyncio.to_thread(scan, root))
+        if awatch is None or not os.path.isdir(root):
+            await asyncio.sleep(rescan_every)
+            continue
+        async for changes in awatch(
+            root, rust_timeout=int(rescan_every * 1000), yield_on_timeout=True
+        ):
+            if not changes:
+                break  # timed out, go rescan
+            for change, path in changes:
+                if change == Change.deleted:
+                    await asyncio.to_thread(catalog.forget, path)
+                else:
+                    await asyncio.to_thread(catalog.touch, path)
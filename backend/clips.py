@@ -0,0 +1,135 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, List, Sequence, Tuple
+
+from catalog import START_FORMAT
+from mp4probe import KeyframeIndex
+
+# MediaMTX starts the next segment where the last one ended; a bigger gap
+# means the publisher dropped out and it's a different broadcast
+GAP_SECONDS = 5.0
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class Piece:
+    path: str
+    start: float  # seconds into the segment
+    end: float
+
+
+@dataclass(frozen=True)
+class Slice:
+    path: str
+    # byte ranges of path that make up the cut
+    ranges: Tuple[Tuple[int, int], ...]
+    # for files without a keyframe index, where ffmpeg should trim instead
+    inpoint: float | None = None
+    outpoint: float | None = None
+
+    @property
+    def source_bytes(self) -> int:
+        return sum(end - start for start, end in self.ranges)
+
+
+def plan_clip(
+    segments: Sequence[Tuple[str, str, float]], start: float, end: float
+) -> List[Piece]:
+    """Which parts of which segments cover [start, end), in seconds from the
+    start of the first segment. segments are (path, start timestamp, seconds)
+    in order; stitching stops at the first gap in the recording."""
+    if not segments:
+        return []
+    origin = datetime.strptime(segments[0][1], START_FORMAT)
+    pieces = []
+    covered = 0.0
+    for path, timestamp, seconds in segments:
+        offset = (datetime.strptime(timestamp, START_FORMAT) - origin).total_seconds()
+        if offset > covered + GAP_SECONDS or offset >= end:
+            break
+        covered = max(covered, offset + seconds)
+        piece_start, piece_end = max(start, offset), min(end, offset + seconds)
+        if piece_end > piece_start:
+            pieces.append(Piece(path, piece_start - offset, piece_end - offset))
+    return pieces
+
+
+def cut(piece: Piece, index: KeyframeIndex | None, size: int) -> Slice:
+    """The bytes of piece's segment from the last keyframe at or before its
+    start to the first keyframe at or after its end, after the init segment."""
+    if index is None or not index.frames:
+        return Slice(piece.path, ((0, size),), piece.start, piece.end)
+    times = [seconds for seconds, _ in index.frames]
+    first = max(bisect_right(times, piece.start) - 1, 0)
+    last = bisect_left(times, piece.end)
+    begin = index.frames[first][1]
+    stop = index.frames[last][1] if last < len(index.frames) else size
+    return Slice(piece.path, ((0, index.init_size), (begin, stop)))
+
+
+def write_slices(slices: Sequence[Slice], directory: str) -> str:
+    """Copy each keyframe-aligned slice into directory and write an ffmpeg
+    concat list over them; returns the list's path."""
+    lines = []
+    for i, piece in enumerate(slices):
+        if piece.inpoint is not None:
+            source = piece.path
+        else:
+            source = os.path.join(directory, f"{i}.mp4")
+            with open(piece.path, "rb") as src, open(source, "wb") as dst:
+                for start, end in piece.ranges:
+                    src.seek(start)
+                    remaining = end - start
+                    while remaining > 0:
+                        chunk = src.read(min(remaining, 1024 * 1024))
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        remaining -= len(chunk)
+        lines.append("file '" + source.replace("'", "'\\''") + "'")
+        if piece.inpoint is not None:
+            lines.append(f"inpoint {piece.inpoint:.3f}")
+            lines.append(f"outpoint {piece.outpoint:.3f}")
+    listing = os.path.join(directory, "concat.txt")
+    with open(listing, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return listing
+
+
+def build_command(listing: str) -> List[str]:
+    return [
+        "ffmpeg", "-hide_banner", "-nostats", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", listing,
+        "-map", "0", "-c", "copy", "-avoid_negative_ts", "make_zero",
+        "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+        "-f", "mp4", "pipe:1",
+    ]  # fmt: skip
+
+
+async def stream_clip(slices: Sequence[Slice]) -> AsyncIterator[bytes]:
+    """Stitch slices into one fragmented MP4 with ffmpeg stream copy,
+    yielding it as it's written."""
+    directory = await asyncio.to_thread(tempfile.mkdtemp, prefix="clip-")
+    process = None
+    try:
+        listing = await asyncio.to_thread(write_slices, slices, directory)
+        process = await asyncio.create_subprocess_exec(
+            *build_command(listing),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        while chunk := await process.stdout.read(CHUNK_SIZE):  # type: ignore
+            yield chunk
+        if await process.wait() != 0:
+            print(f"clip ffmpeg exited with {process.returncode}")
+    finally:
+        if process is not None and process.returncode is None:
+            # the client went away mid-clip
+            process.kill()
+            await process.wait()
+        await asyncio.to_thread(shutil.rmtree, directory, True)
@@ -0,0 +1,424 @@
+import argparse
+import asyncio
+import os
+import re
+import shlex
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Collection, Dict, List, Sequence, Set, Tuple
+
+WIDTH = 1920
+HEIGHT = 1080
+FPS = 30
+BACKGROUND = "0x1f2d3d"
+HIGHLIGHT = "0x338eda"  # Hack Club blue, around the focused stream
+BORDER = 8
+MAX_THUMBNAILS = 6
+FONT_FILE = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+JOIN_TEXT = "Join at https://hack.club/onboard-live"
+IDLE_TEXT = "No one is here yet! Check back later."
+# how long an input that broke ffmpeg stays out of the layout
+FAILED_INPUT_SECONDS = 60.0
+
+# lavfi test patterns, picked per stream so tiles can be told apart
+PATTERNS = ["testsrc", "testsrc2", "smptebars", "rgbtestsrc", "mandelbrot", "yuvtestsrc"]
+
+
+@dataclass(frozen=True)
+class Tile:
+    name: str
+    x: int
+    y: int
+    width: int
+    height: int
+    focused: bool
+    audio: bool = False
+
+
+@dataclass(frozen=True)
+class Layout:
+    tiles: Tuple[Tile, ...] = ()
+
+
+def _even(value: float) -> int:
+    # yuv420p needs even sizes and offsets
+    return int(value) // 2 * 2
+
+
+def plan_layout(
+    streams: Sequence[str],
+    focused: str | None,
+    audio: Collection[str] = (),
+    width: int = WIDTH,
+    height: int = HEIGHT,
+    max_thumbnails: int = MAX_THUMBNAILS,
+) -> Layout:
+    """Same arrangement as the tiling page: the focused stream large at the
+    top, everyone else in a strip of thumbnails along the bottom. audio
+    names the streams that have an audio track."""
+    if not streams:
+        return Layout()
+    if focused not in streams:
+        focused = streams[0]
+    others = [name for name in streams if name != focused][:max_thumbnails]
+    if not others:
+        main_w, main_h = _even(width * 0.85), _even(height * 0.85)
+        return Layout(
+            (Tile(focused, _even((width - main_w) / 2), _even((height - main_h) / 2), main_w, main_h, True, focused in audio),)
+        )
+    main_h = _even(height * 0.62)
+    main_w = _even(main_h * 16 / 9)
+    tiles = [Tile(focused, _even((width - main_w) / 2), _even(height * 0.04), main_w, main_h, True, focused in audio)]
+    gap = _even(width * 0.02)
+    thumb_w = _even(min(width * 0.25, (width - gap * (len(others) + 1)) / len(others)))
+    thumb_h = _even(min(height * 0.25, thumb_w * 9 / 16))
+    thumb_w = _even(thumb_h * 16 / 9)
+    x = _even((width - len(others) * thumb_w - (len(others) - 1) * gap) / 2)
+    y = _even(height * 0.96 - thumb_h)
+    for name in others:
+        tiles.append(Tile(name, x, y, thumb_w, thumb_h, False))
+        x += thumb_w + gap
+    return Layout(tuple(tiles))
+
+
+def rtsp_source(base_url: str) -> Callable[[str], List[str]]:
+    def inputs(name: str) -> List[str]:
+        return ["-rtsp_transport", "tcp", "-i", f"{base_url}/{name}"]
+
+    return inputs
+
+
+def testsrc_source(name: str) -> List[str]:
+    pattern = PATTERNS[zlib.crc32(name.encode()) % len(PATTERNS)]
+    return ["-re", "-f", "lavfi", "-i", f"{pattern}=size=1280x720:rate={FPS}"]
+
+
+def _text(text: str, size: int, y: str) -> str:
+    return (
+        f"drawtext=fontfile={FONT_FILE}:text='{text}':fontcolor=white:fontsize={size}"
+        f":x=(w-text_w)/2:y={y}"
+    )
+
+
+def build_command(
+    layout: Layout,
+    source: Callable[[str], List[str]],
+    output: str = "pipe:1",
+    width: int = WIDTH,
+    height: int = HEIGHT,
+    bitrate: str = "2500k",
+    ts_offset: float = 0.0,
+) -> List[str]:
+    """The mixer: tiles the layout's inputs onto the canvas and writes
+    MPEG-TS for the output process to forward."""
+    command = [
+        "ffmpeg", "-hide_banner", "-nostats", "-loglevel", "warning",
+        "-re", "-f", "lavfi", "-i", f"color=c={BACKGROUND}:s={width}x{height}:r={FPS}",
+        "-re", "-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo",
+    ]  # fmt: skip
+    filters = ["[0:v]format=yuv420p[bg0]"]
+    audio = "1:a"
+    for i, tile in enumerate(layout.tiles):
+        command += source(tile.name)
+        inner_w, inner_h = tile.width, tile.height
+        if tile.focused:
+            inner_w, inner_h = tile.width - 2 * BORDER, tile.height - 2 * BORDER
+        chain = (
+            f"[{i + 2}:v]setpts=PTS-STARTPTS,fps={FPS},"
+            f"scale={inner_w}:{inner_h}:force_original_aspect_ratio=decrease,"
+            f"pad={inner_w}:{inner_h}:-1:-1:color=black,setsar=1"
+        )
+        if tile.focused:
+            chain += f",pad={tile.width}:{tile.height}:{BORDER}:{BORDER}:color={HIGHLIGHT}"
+        filters.append(f"{chain}[v{i}]")
+        # eof_action=pass: a publisher dropping out leaves a gap instead of
+        # ending the broadcast before the layout catches up
+        filters.append(
+            f"[bg{i}][v{i}]overlay={tile.x}:{tile.y}:eof_action=pass:repeatlast=0[bg{i + 1}]"
+        )
+        if tile.focused and tile.audio:
+            # the focused streamer is heard, as on the old tiling page
+            filters.append(f"[{i + 2}:a]asetpts=PTS-STARTPTS,aresample=async=1000[a]")
+            audio = "[a]"
+    text = [_text(JOIN_TEXT, _even(height * 0.03), f"h-text_h-{_even(height * 0.008)}")]
+    if not layout.tiles:
+        text.append(_text(IDLE_TEXT, _even(height * 0.045), "(h-text_h)/2"))
+    filters.append(f"[bg{len(layout.tiles)}]{','.join(text)}[out]")
+    command += [
+        "-filter_complex", ";".join(filters),
+        "-map", "[out]", "-map", audio,
+        "-c:v", "libx264", "-preset", "veryfast", "-tune", "zerolatency",
+        "-b:v", bitrate, "-maxrate", bitrate, "-bufsize", "5000k",
+        "-g", str(FPS * 2), "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "128k", "-ar", "44100", "-ac", "2",
+        # continue the output's timeline where the last mixer left off
+        "-output_ts_offset", f"{ts_offset:.3f}",
+        "-f", "mpegts", output,
+    ]  # fmt: skip
+    return command
+
+
+def build_output_command(output: str) -> List[str]:
+    """The output process: forwards the mixers' MPEG-TS without re-encoding
+    and holds the connection to output while mixers come and go."""
+    command = [
+        "ffmpeg", "-hide_banner", "-nostats", "-loglevel", "warning",
+        "-fflags", "+genpts+discardcorrupt", "-f", "mpegts", "-i", "pipe:0",
+        "-map", "0:v", "-map", "0:a", "-c", "copy",
+    ]  # fmt: skip
+    if output.startswith("rtmp") or output.endswith(".flv"):
+        command += ["-bsf:a", "aac_adtstoasc", "-f", "flv", "-flvflags", "no_duration_filesize"]
+    elif output.startswith("rtsp"):
+        command += ["-f", "rtsp", "-rtsp_transport", "tcp"]
+    return command + [output]
+
+
+class Compositor:
+    """Composites the live streams straight from MediaMTX and pushes the
+    result to output, with two kinds of ffmpeg process.
+
+    The output process holds the connection to output (YouTube) for as long
+    as the compositor runs, forwarding MPEG-TS from a pipe without
+    re-encoding. A mixer decodes the layout's inputs, tiles them and writes
+    into that pipe. A layout change only replaces the mixer, and the next
+    one carries on the output's timeline, so viewers see a brief freeze
+    rather than the broadcast ending.
+
+    update() only records what should be shown. The supervisor waits settle
+    seconds for bursts of changes to finish before swapping mixers. When a
+    mixer dies, inputs named in its errors are left out for a while instead
+    of retrying the same graph; anything else is retried with backoff.
+    """
+
+    def __init__(
+        self,
+        output: str,
+        source: Callable[[str], List[str]],
+        settle: float = 2.0,
+        stop_timeout: float = 5.0,
+    ):
+        self.output = output
+        self.source = source
+        self.settle = settle
+        self.stop_timeout = stop_timeout
+        self.streams: Tuple[str, ...] = ()
+        self.focused: str | None = None
+        self.audio: frozenset = frozenset()
+        self.failed: Dict[str, float] = {}  # stream -> when it may be tried again
+        self.layout: Layout | None = None
+        self.mixer: asyncio.subprocess.Process | None = None
+        self.mixer_errors: asyncio.Task | None = None
+        self.suspects: Set[str] = set()
+        self.sink: asyncio.subprocess.Process | None = None
+        self.pipe: int | None = None  # write end of the sink's stdin
+        self.epoch = 0.0  # when the sink started, for the mixers' timestamps
+        self.task: asyncio.Task | None = None
+        self.spawned = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def update(self, streams: Sequence[str], focused: str | None, audio: Collection[str] = ()):
+        state = (tuple(streams), focused, frozenset(audio))
+        if state != (self.streams, self.focused, self.audio):
+            self.streams, self.focused, self.audio = state
+            self._changed.set()
+
+    def desired(self, now: float) -> Layout:
+        for name, until in list(self.failed.items()):
+            if until <= now:
+                del self.failed[name]
+        streams = [name for name in self.streams if name not in self.failed]
+        return plan_layout(streams, self.focused, self.audio)
+
+    def start(self):
+        if not self.running:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        await self._stop_mixer()
+        await self._stop_sink()
+
+    async def _wait(self, process: asyncio.subprocess.Process):
+        try:
+            await asyncio.wait_for(process.wait(), self.stop_timeout)
+        except asyncio.TimeoutError:
+            process.terminate()
+            try:
+                await asyncio.wait_for(process.wait(), self.stop_timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+
+    async def _stop_mixer(self):
+        process, self.mixer = self.mixer, None
+        if process is None or process.returncode is not None:
+            return
+        try:
+            # "q" lets ffmpeg finish its last packets cleanly
+            process.stdin.write(b"q")  # type: ignore
+            await process.stdin.drain()  # type: ignore
+        except ConnectionError:
+            process.terminate()
+        await self._wait(process)
+
+    async def _stop_sink(self):
+        if self.pipe is not None:
+            os.close(self.pipe)  # EOF lets the sink close the output cleanly
+            self.pipe = None
+        process, self.sink = self.sink, None
+        if process is not None and process.returncode is None:
+            await self._wait(process)
+
+    async def _start_sink(self):
+        read_end, self.pipe = os.pipe()
+        try:
+            self.sink = await asyncio.create_subprocess_exec(
+                *build_output_command(self.output), stdin=read_end
+            )
+        finally:
+            os.close(read_end)
+        self.epoch = time.monotonic()
+
+    async def _read_errors(self, stream: asyncio.StreamReader, names: Sequence[str]):
+        async for line in stream:
+            text = line.decode(errors="replace").rstrip()
+            print(f"compositor: {text}")
+            # ffmpeg's input errors carry the RTSP URL, which ends in the name
+            self.suspects.update(
+                name for name in names if re.search(rf"(?<![\w-]){re.escape(name)}(?![\w-])", text)
+            )
+
+    async def _spawn_mixer(self):
+        self.suspects = set()
+        self.mixer = await asyncio.create_subprocess_exec(
+            *build_command(
+                self.layout,  # type: ignore
+                self.source,
+                ts_offset=time.monotonic() - self.epoch,
+            ),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=self.pipe,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        self.mixer_errors = asyncio.create_task(
+            self._read_errors(
+                self.mixer.stderr,  # type: ignore
+                [tile.name for tile in self.layout.tiles],  # type: ignore
+            )
+        )
+        self.spawned += 1
+
+    async def _run(self):
+        mixer_failures = 0
+        sink_failures = 0
+        started = time.monotonic()
+        try:
+            while True:
+                if self.sink is None or self.sink.returncode is not None:
+                    if self.sink is not None:
+                        sink_failures += 1
+                        delay = min(30, 2**sink_failures)
+                        print(
+                            f"compositor output exited with {self.sink.returncode}, "
+                            f"reconnecting in {delay}s"
+                        )
+                        await self._stop_mixer()
+                        await self._stop_sink()
+                        await asyncio.sleep(delay)
+                    await self._start_sink()
+                desired = self.desired(time.monotonic())
+                if self.mixer is None or self.layout != desired:
+                    await self._stop_mixer()
+                    self.layout = desired
+                    await self._spawn_mixer()
+                    started = time.monotonic()
+                self._changed.clear()
+                changed = asyncio.create_task(self._changed.wait())
+                mixer_exited = asyncio.create_task(self.mixer.wait())  # type: ignore
+                sink_exited = asyncio.create_task(self.sink.wait())  # type: ignore
+                # wake up when a dropped input may come back, too
+                timeout = min(self.failed.values()) - time.monotonic() if self.failed else None
+                done, _ = await asyncio.wait(
+                    {changed, mixer_exited, sink_exited},
+                    timeout=max(timeout, 0.1) if timeout is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for waiter in (changed, mixer_exited, sink_exited):
+                    waiter.cancel()
+                if sink_exited in done:
+                    continue
+                if mixer_exited in done:
+                    await self.mixer_errors  # type: ignore
+                    returncode = self.mixer.returncode  # type: ignore
+                    self.mixer = None
+                    if self.suspects:
+                        for name in self.suspects:
+                            self.failed[name] = time.monotonic() + FAILED_INPUT_SECONDS
+                        print(
+                            f"compositor mixer exited with {returncode}, leaving out "
+                            f"{', '.join(sorted(self.suspects))} for {FAILED_INPUT_SECONDS:.0f}s"
+                        )
+                        await asyncio.sleep(1)
+                        continue
+                    # a short run counts as another failure, a long one resets the backoff
+                    mixer_failures = mixer_failures + 1 if time.monotonic() - started < 30 else 1
+                    delay = min(30, 2**mixer_failures)
+                    print(f"compositor mixer exited with {returncode}, restarting in {delay}s")
+                    await asyncio.sleep(delay)
+                elif changed in done:
+                    await asyncio.sleep(self.settle)  # let a burst of changes land
+        finally:
+            await self._stop_mixer()
+            await self._stop_sink()
+
+
+async def _demo(args):
+    streams = [f"test{i}" for i in range(args.testsrc)] or args.streams
+    source = testsrc_source if args.testsrc else rtsp_source(args.rtsp)
+    compositor = Compositor(args.output, source, settle=0.5)
+    compositor.update(streams, streams[0] if streams else None)
+    compositor.start()
+    started = time.monotonic()
+    turn = 0
+    while time.monotonic() - started < args.duration:
+        await asyncio.sleep(min(args.rotate, args.duration - (time.monotonic() - started)))
+        turn += 1
+        if streams:
+            compositor.update(streams, streams[turn % len(streams)])
+    await compositor.stop()
+    print(f"ran {compositor.spawned} mixer(s) into one output")
+
+
+def main():
+    """Try the compositor without the backend:
+
+    python compositor.py --testsrc 4 --output /tmp/composite.flv --duration 20 --rotate 5
+    python compositor.py --rtsp rtsp://localhost:8554 --output /tmp/composite.flv key1 key2
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("streams", nargs="*")
+    parser.add_argument("--testsrc", type=int, default=0, help="use N lavfi test patterns")
+    parser.add_argument("--rtsp", default="rtsp://localhost:8554")
+    parser.add_argument("--output", default="/tmp/composite.flv")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--rotate", type=float, default=5.0, help="seconds between focus changes")
+    parser.add_argument("--print", action="store_true", help="print the ffmpeg commands and exit")
+    args = parser.parse_args()
+    if args.print:
+        streams = [f"test{i}" for i in range(args.testsrc)] or args.streams
+        source = testsrc_source if args.testsrc else rtsp_source(args.rtsp)
+        layout = plan_layout(streams, streams[0] if streams else None)
+        print(shlex.join(build_command(layout, source)) + " | " + shlex.join(build_output_command(args.output)))
+        return
+    asyncio.run(_demo(args))
+
+
+if __name__ == "__main__":
+    main()
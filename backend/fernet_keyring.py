@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+import time
+from typing import List, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+
+from state import StateStore
+
+KEYRING_KEY = "fernet_keys"
+
+
+class TokenExpired(Exception):
+    pass
+
+
+class KeyRing:
+    """Rotating Fernet keys shared by every worker through the state store.
+
+    Rotation only ever prepends a key, so it never waits on anyone. A retired
+    key keeps decrypting for `overlap` seconds after its successor appeared,
+    and each token carries its own expiry on top of that.
+    """
+
+    def __init__(self, store: StateStore, overlap: float = 7200.0, reload_after: float = 5.0):
+        self.store = store
+        self.overlap = overlap
+        self.reload_after = reload_after
+        self.keys: List[Tuple[str, float]] = []  # (key, created), newest first
+        self.loaded_at = 0.0
+        self.fernet: MultiFernet | None = None
+
+    def _prune(self, keys: List[Tuple[str, float]], now: float) -> List[Tuple[str, float]]:
+        kept = keys[:1]
+        for (key, created), (_, successor_created) in zip(keys[1:], keys):
+            if now - successor_created < self.overlap:
+                kept.append((key, created))
+        return kept
+
+    async def _read(self) -> List[Tuple[str, float]]:
+        raw = await self.store.get(KEYRING_KEY)
+        return [tuple(key) for key in json.loads(raw)] if raw else []  # type: ignore
+
+    async def _write(self, keys: List[Tuple[str, float]]):
+        await self.store.set(KEYRING_KEY, json.dumps(keys))
+
+    async def load(self, force: bool = False) -> MultiFernet:
+        now = time.time()
+        if self.fernet is not None and not force and now - self.loaded_at < self.reload_after:
+            return self.fernet
+        keys = await self._read()
+        while not keys:
+            # first boot: one worker creates the keyring, the rest wait for it
+            if await self.store.acquire_lease(f"{KEYRING_KEY}_init", str(os.getpid()), 10):
+                keys = [(Fernet.generate_key().decode(), now)]
+                await self._write(keys)
+            else:
+                await asyncio.sleep(0.1)
+                keys = await self._read()
+        self.keys = self._prune(keys, now)
+        self.fernet = MultiFernet([Fernet(key.encode()) for key, _ in self.keys])
+        self.loaded_at = now
+        return self.fernet
+
+    async def rotate(self):
+        now = time.time()
+        keys = self._prune([(Fernet.generate_key().decode(), now)] + await self._read(), now)
+        await self._write(keys)
+        await self.load(force=True)
+
+    async def encrypt(self, data: bytes, ttl: float) -> bytes:
+        expires = int(time.time() + ttl)
+        return (await self.load()).encrypt(b"%d|%s" % (expires, data))
+
+    async def decrypt(self, token: bytes) -> bytes:
+        try:
+            payload = (await self.load()).decrypt(token)
+        except InvalidToken:
+            # another worker may have rotated since we last looked
+            payload = (await self.load(force=True)).decrypt(token)
+        expires, data = payload.split(b"|", 1)
+        if int(expires) < time.time():
+            raise TokenExpired()
+        return data
@@ -0,0 +1,105 @@
+import heapq
+import itertools
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+
+@dataclass
+class Airtime:
+    seconds: float = 0.0
+    last_focused: float = 0.0  # unix time, 0 if never focused
+
+
+class FocusScheduler:
+    """Fair focus rotation over the live streams.
+
+    The next stream is the one with the least accumulated focus time, ties
+    broken by whoever has waited longest since their last focus. Candidates
+    live in a heap; entries made stale by an airtime update or a stream going
+    offline are skipped lazily, so selection stays O(log n).
+    """
+
+    def __init__(self, slot_seconds: float = 300.0):
+        self.slot_seconds = slot_seconds
+        self.airtime: Dict[str, Airtime] = {}
+        self.live: Dict[str, int] = {}  # stream key -> heap entry generation
+        self.heap: List[Tuple[float, float, int, str]] = []
+        self.focused: str | None = None
+        self.focused_since = 0.0
+        self._counter = itertools.count()
+
+    def reset(self):
+        # forget live streams and the current slot, e.g. before taking over
+        # from another process; airtime is kept until it's loaded again
+        self.live.clear()
+        self.heap.clear()
+        self.focused = None
+        self.focused_since = 0.0
+
+    def load(self, name: str, seconds: float, last_focused: float):
+        # restore persisted airtime, e.g. from Stream.focus_seconds at startup
+        self.airtime[name] = Airtime(seconds, last_focused)
+        if name in self.live:
+            self._push(name)
+
+    def _push(self, name: str):
+        generation = next(self._counter)
+        self.live[name] = generation
+        airtime = self.airtime.setdefault(name, Airtime())
+        heapq.heappush(self.heap, (airtime.seconds, airtime.last_focused, generation, name))
+
+    def add(self, name: str):
+        if name not in self.live:
+            self._push(name)
+
+    def remove(self, name: str, now: float):
+        if self.focused == name:
+            self.release(now)
+        self.live.pop(name, None)
+
+    def release(self, now: float) -> Tuple[str, float] | None:
+        """End the current focus slot and return (stream key, seconds focused)."""
+        if self.focused is None:
+            return None
+        name, elapsed = self.focused, max(0.0, now - self.focused_since)
+        airtime = self.airtime.setdefault(name, Airtime())
+        airtime.seconds += elapsed
+        airtime.last_focused = now
+        self.focused = None
+        if name in self.live:
+            self._push(name)
+        return name, elapsed
+
+    def resume(self, name: str, since: float):
+        # continue a focus slot handed over from another process
+        self.add(name)
+        self.focused = name
+        self.focused_since = since
+
+    def pick(self, now: float, eligible: Callable[[str], bool] | None = None) -> str | None:
+        """Hand focus to the most deserving eligible live stream other than the
+        current one. Ineligible streams keep their place for next time."""
+        skipped = []
+        chosen = None
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            _, _, generation, name = entry
+            if self.live.get(name) != generation:
+                continue  # stale entry
+            if name == self.focused or (eligible is not None and not eligible(name)):
+                skipped.append(entry)
+                continue
+            chosen = name
+            break
+        for entry in skipped:
+            # the same entry, so it doesn't lose ties to streams behind it
+            heapq.heappush(self.heap, entry)
+        if chosen is None:
+            return self.focused  # nobody else can take over
+        self.release(now)
+        self.focused = chosen
+        self.focused_since = now
+        return chosen
+
+    def due(self, now: float) -> bool:
+        return self.focused is None or now - self.focused_since >= self.slot_seconds
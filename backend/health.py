@@ -0,0 +1,110 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterable, Tuple
+
+from mediamtx import PathInfo
+
+VIDEO_CODECS = {
+    "AV1", "VP9", "VP8", "H265", "H264", "MPEG-4 Video", "MPEG-1/2 Video", "M-JPEG",
+}  # fmt: skip
+
+
+@dataclass
+class PublisherHealth:
+    samples: Deque[Tuple[float, int]]  # (monotonic time, bytesReceived)
+    tracks: Tuple[str, ...] = ()
+    progressed_at: float = 0.0  # last time bytesReceived went up
+    first_seen: float = 0.0
+
+    def bitrate(self) -> float | None:
+        """Bits per second across the window, None until there are two samples."""
+        if len(self.samples) < 2:
+            return None
+        (start, start_bytes), (end, end_bytes) = self.samples[0], self.samples[-1]
+        if end <= start:
+            return None
+        return (end_bytes - start_bytes) * 8 / (end - start)
+
+
+@dataclass
+class HealthMonitor:
+    """Ingest telemetry for every MediaMTX path, from periodic samples of
+    bytesReceived kept in a fixed-size ring buffer per path.
+
+    A ready path is stalled once its byte counter hasn't moved for
+    stall_seconds, or once a full window of samples averages below
+    min_bitrate (a frozen or collapsing encoder). Stalled paths and paths
+    without a video track don't get focus.
+    """
+
+    window: int = 15
+    stall_seconds: float = 10.0
+    min_bitrate: float = 100_000
+    paths: Dict[str, PublisherHealth] = field(default_factory=dict)
+
+    def observe(self, paths: Iterable[PathInfo], now: float):
+        seen = set()
+        for path in paths:
+            if not path.ready:
+                continue
+            seen.add(path.name)
+            health = self.paths.get(path.name)
+            if health is None or (health.samples and path.bytes_received < health.samples[-1][1]):
+                # new publisher, or it reconnected and the counter restarted
+                health = PublisherHealth(deque(maxlen=self.window), progressed_at=now, first_seen=now)
+                self.paths[path.name] = health
+            elif not health.samples or path.bytes_received > health.samples[-1][1]:
+                health.progressed_at = now
+            health.samples.append((now, path.bytes_received))
+            health.tracks = path.tracks
+        for name in self.paths.keys() - seen:
+            del self.paths[name]
+
+    def stalled(self, name: str, now: float) -> bool:
+        health = self.paths.get(name)
+        if health is None:
+            return False  # no samples yet, give it the benefit of the doubt
+        if now - health.progressed_at >= self.stall_seconds:
+            return True
+        bitrate = health.bitrate()
+        return (
+            len(health.samples) == self.window
+            and bitrate is not None
+            and bitrate < self.min_bitrate
+        )
+
+    def has_video(self, name: str) -> bool:
+        health = self.paths.get(name)
+        # MediaMTX only lists tracks once the publisher has described them
+        return health is None or not health.tracks or bool(VIDEO_CODECS & set(health.tracks))
+
+    def eligible(self, name: str, now: float) -> bool:
+        return self.has_video(name) and not self.stalled(name, now)
+
+    def renderable(self, name: str, now: float) -> bool:
+        """Stricter than eligible: sampled, with a known video track, and
+        not stalled, so the compositor never opens an input it can't tile."""
+        health = self.paths.get(name)
+        return (
+            health is not None
+            and bool(VIDEO_CODECS & set(health.tracks))
+            and not self.stalled(name, now)
+        )
+
+    def has_audio(self, name: str) -> bool:
+        health = self.paths.get(name)
+        return health is not None and bool(set(health.tracks) - VIDEO_CODECS)
+
+    def report(self, now: float) -> Dict[str, dict]:
+        report = {}
+        for name, health in self.paths.items():
+            bitrate = health.bitrate()
+            report[name] = {
+                "bitrate_kbps": round(bitrate / 1000, 1) if bitrate is not None else None,
+                "seconds_since_progress": round(now - health.progressed_at, 1),
+                "uptime_seconds": round(now - health.first_seen, 1),
+                "tracks": list(health.tracks),
+                "stalled": self.stalled(name, now),
+                "eligible": self.eligible(name, now),
+            }
+        return report
@@ -0,0 +1,65 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable
+
+
+@dataclass(frozen=True)
+class Identity:
+    user_id: str
+    slack_id: str
+    name: str
+    stream_key: str | None
+
+
+class IdentityCache:
+    """Write-through map of stream key / Slack ID -> user identity.
+
+    Loaded once from the User+Stream join at startup and kept current by
+    whoever writes those tables, so hot paths never query the database.
+    """
+
+    def __init__(self):
+        self.by_key: Dict[str, Identity] = {}
+        self.by_slack_id: Dict[str, Identity] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, users: Iterable):
+        # users as returned by db.user.find_many(include={"stream": True})
+        self.by_key.clear()
+        self.by_slack_id.clear()
+        for user in users:
+            self.put(user, user.stream)
+
+    def put(self, user, stream=None) -> Identity:
+        self.invalidate(user.slack_id)
+        identity = Identity(
+            user_id=user.id,
+            slack_id=user.slack_id,
+            name=user.name,
+            stream_key=stream.key if stream else None,
+        )
+        self.by_slack_id[identity.slack_id] = identity
+        if identity.stream_key is not None:
+            self.by_key[identity.stream_key] = identity
+        return identity
+
+    def invalidate(self, slack_id: str):
+        identity = self.by_slack_id.pop(slack_id, None)
+        if identity is not None and identity.stream_key is not None:
+            self.by_key.pop(identity.stream_key, None)
+
+    def _count(self, identity: Identity | None) -> Identity | None:
+        if identity is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return identity
+
+    def for_stream(self, stream_key: str) -> Identity | None:
+        return self._count(self.by_key.get(stream_key))
+
+    def for_slack_id(self, slack_id: str) -> Identity | None:
+        return self._count(self.by_slack_id.get(slack_id))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.by_slack_id)}
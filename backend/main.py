@@ -1,57 +1,130 @@
+import asyncio
+import functools
 import hashlib
 import hmac
 import json
 import os
+import time
 from contextlib import asynccontextmanager
-from datetime import datetime
-from secrets import choice, token_hex
-from typing import Dict, List
+from datetime import datetime, timedelta, timezone
+from secrets import token_hex
+from typing import Dict, List, Set, Tuple
 
-import cv2
 import httpx
 import uvicorn
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    JobEvent,
+)
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from cryptography.fernet import Fernet
+from cryptography.fernet import InvalidToken
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import (
+    FileResponse,
+    HTMLResponse,
+    RedirectResponse,
+    StreamingResponse,
+)
 from prisma import Prisma
+from prisma.errors import UniqueViolationError
 from slack_bolt.adapter.fastapi.async_handler import AsyncSlackRequestHandler
 from slack_bolt.async_app import AsyncAck, AsyncApp
 from yarl import URL
 
-load_dotenv(dotenv_path="./.env")
-
-active_stream: Dict[str, str | bool] = {}
-active_streams: List[Dict[str, str | bool]] = []
-
-scheduler = AsyncIOScheduler()
+import metrics
+from broadcast import Broadcaster
+from catalog import (
+    HOST_RECORDINGS_ROOT,
+    RECORDINGS_ROOT,
+    START_FORMAT,
+    Recording,
+    RecordingCatalog,
+    local_recording_path,
+    parse_start,
+    recording_path,
+    watch,
+)
+from clips import cut, plan_clip, stream_clip
+from compositor import Compositor, rtsp_source
+from fernet_keyring import KeyRing, TokenExpired
+from focus import FocusScheduler
+from health import HealthMonitor
+from identity import Identity, IdentityCache
+from mediamtx import MediaMTXClient
+from probe_pool import ProbeService
+from reconcile import ReconcileResult, reconcile_paths
+from registry import Snapshot, StreamRegistry
+from sheets import ContactSheets
+from slack_directory import SlackDirectory
+from slack_queue import SlackOutbox, TimedWebClient
+from state import LeaderElection, open_store
 
-FERNET_KEY = Fernet.generate_key()
-FERNET_KEY_USERS = []
+load_dotenv(dotenv_path="./.env")
 
+store = open_store(os.environ.get("STATE_URL", "sqlite:///./db/state.db"))
+leader = LeaderElection(
+    store,
+    ttl=float(os.environ.get("LEADER_TTL", "15")),
+    on_elected=lambda: take_leadership(),
+)
 
-FERNET = Fernet(FERNET_KEY)
+keyring = KeyRing(
+    store, overlap=float(os.environ.get("FERNET_OVERLAP_MINUTES", "120")) * 60
+)
+# how long a /onboard-live-submit link stays valid
+STATE_TOKEN_TTL = float(os.environ.get("STATE_TOKEN_TTL_MINUTES", "60")) * 60
+
+STATUS_PAGE_SIZE = 50
+LEADERBOARD_MAX_LIMIT = 100
+REVIEW_PAGE_MAX = 200
+# bearer token for the session review API, which is off when unset
+REVIEW_TOKEN = os.environ.get("REVIEW_TOKEN", "")
+# sent by MediaMTX's runOn* hooks; they're refused when unset
+MEDIAMTX_HOOK_SECRET = os.environ.get("MEDIAMTX_HOOK_SECRET", "")
+CLIP_MAX_SECONDS = float(os.environ.get("CLIP_MAX_SECONDS", "600"))
+# ffmpeg processes serving clips at once
+clip_slots = asyncio.Semaphore(int(os.environ.get("CLIP_CONCURRENCY", "2")))
+
+GITHUB_URL = os.environ.get("GITHUB_URL", "https://github.com")
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+
+registry = StreamRegistry()
+# pushes every new registry snapshot to /api/v1/events subscribers
+snapshots = Broadcaster()
+# the last snapshot a follower picked up from the leader
+relayed: Snapshot | None = None
+# (snapshot version, JSON body, ETag) for /api/v1/streams
+streams_body: Tuple[int, bytes, str] | None = None
+identities = IdentityCache()
+focus = FocusScheduler(slot_seconds=float(os.environ.get("FOCUS_SLOT_SECONDS", "300")))
+health = HealthMonitor(
+    stall_seconds=float(os.environ.get("STALL_SECONDS", "10")),
+    min_bitrate=float(os.environ.get("MIN_BITRATE_KBPS", "100")) * 1000,
+)
+HEALTH_SAMPLE_SECONDS = float(os.environ.get("HEALTH_SAMPLE_SECONDS", "2"))
 
+scheduler = AsyncIOScheduler()
 
-async def rotate_fernet_key():
-    global FERNET_KEY
-    global FERNET
-    if FERNET_KEY_USERS == []:
-        FERNET_KEY = Fernet.generate_key()
-        FERNET = Fernet(FERNET_KEY)
-    else:
-        print("not rotating key since we have a pending verification")
+PROCESS_STARTED = time.monotonic()
+startup_seconds: Dict[str, float] = {}
+mediamtx_sync: asyncio.Task | None = None
+catalog_watcher: asyncio.Task | None = None
+loop_lag_watcher: asyncio.Task | None = None
+last_path_reconcile: ReconcileResult | None = None
+# where probe_unprobed carries on from, so files that fail to probe don't
+# hold up the rest
+probe_cursor = ""
+PROBE_BATCH = int(os.environ.get("PROBE_BATCH", "32"))
 
 
-def get_recording_duration(timestamp, stream_key):
-    vid = cv2.VideoCapture(
-        f"/recordings/{stream_key}/{datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ').strftime('%Y-%m-%d_%H-%M-%S-%f')}.mp4"
-    )
+async def get_recording_duration(timestamp, stream_key):
     return int(
-        (vid.get(cv2.CAP_PROP_FRAME_COUNT) / vid.get(cv2.CAP_PROP_FPS)) / 60
+        await probe_service.duration(recording_path(timestamp, stream_key)) / 60
     )  # seconds to minutes
 
 
@@ -77,117 +150,458 @@ def verify_gh_signature(payload_body, secret_token, signature_header):
         raise HTTPException(status_code=403, detail="Request signatures didn't match!")
 
 
-async def get_recording_list(stream_key: str) -> List[str]:
-    async with httpx.AsyncClient() as client:
-        return [
-            recording["start"]
-            for recording in (
-                await client.get(
-                    f"http://{os.environ['MEDIAMTX_IP']}:9997/v3/recordings/get/{stream_key}"
-                )
-            ).json()["segments"]
-        ]
+def verify_review_token(authorization: str | None):
+    if not REVIEW_TOKEN:
+        raise HTTPException(status_code=403, detail="Session review is disabled")
+    if not hmac.compare_digest(f"Bearer {REVIEW_TOKEN}", authorization or ""):
+        raise HTTPException(status_code=401, detail="Bad review token")
 
 
-async def update_active():
-    global active_stream
-    global active_streams
-    async with httpx.AsyncClient() as client:
-        streams_raw = (
-            await client.get(f"http://{os.environ['MEDIAMTX_IP']}:9997/v3/paths/list")
-        ).json()["items"]
-        streams = []
-        for stream in streams_raw:
-            streams.append({"name": stream["name"], "ready": stream["ready"]})
-        for stream in streams:
-            if stream["ready"] and stream not in active_streams:
-                active_streams.append(stream)
-        if len(active_streams) == 0:
-            return
-        if active_stream == {}:
-            active_stream = choice(active_streams)
-            return
-        if len(active_streams) == 1:
-            return
-        new_stream = choice(active_streams)
-        while new_stream["name"] == active_stream["name"]:
-            new_stream = choice(active_streams)
-        old_active_stream_user = await db.user.find_first(
-            where={
-                "id": (
-                    await db.stream.find_first(
-                        where={"key": str(active_stream["name"])}
-                    )
-                ).user_id  # type: ignore
-            }
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+def verify_hook_secret(secret: str | None):
+    if not MEDIAMTX_HOOK_SECRET or not hmac.compare_digest(
+        MEDIAMTX_HOOK_SECRET, secret or ""
+    ):
+        raise HTTPException(status_code=403, detail="Bad hook secret")
+
+
+async def get_recording_list(
+    stream_key: str, limit: int = -1, offset: int = 0
+) -> List[Recording]:
+    return await asyncio.to_thread(catalog.list, stream_key, limit, offset)
+
+
+async def get_recording_totals(stream_key: str) -> Tuple[int, float]:
+    # segments nobody has probed yet are left to probe_unprobed, so this
+    # stays one row read however big the backlog gets
+    return await asyncio.to_thread(catalog.totals, stream_key)
+
+
+async def get_recording_minutes(recording: Recording) -> int | None:
+    seconds = recording.seconds
+    if seconds is None:  # still being written, or changed since it was probed
+        try:
+            seconds = await probe_service.duration(recording.path)
+        except Exception as e:
+            print(f"probing {recording.path} failed: {e!r}")
+            return None
+    return int(seconds / 60)
+
+
+async def identity_for_stream(stream_key: str) -> Identity | None:
+    identity = identities.for_stream(stream_key)
+    if identity is None:
+        stream = await db.stream.find_first(
+            where={"key": stream_key}, include={"user": True}
         )
-        await bolt.client.chat_postMessage(
-            channel="C07ERCGG989",
-            text=f"Hey <@{old_active_stream_user.slack_id}>, you're no longer in focus!",  # type: ignore
+        if stream is not None:
+            identity = identities.put(stream.user, stream)
+    return identity
+
+
+async def identity_for_slack_id(slack_id: str) -> Identity | None:
+    identity = identities.for_slack_id(slack_id)
+    if identity is None:
+        user = await db.user.find_first(
+            where={"slack_id": slack_id}, include={"stream": True}
         )
-        active_stream = new_stream
-        active_stream_user = await db.user.find_first(
-            where={
-                "id": (
-                    await db.stream.find_first(
-                        where={"key": str(active_stream["name"])}
-                    )
-                ).user_id  # type: ignore
-            }
+        if user is not None:
+            identity = identities.put(user, user.stream)
+    return identity
+
+
+async def save_airtime(stream_key: str):
+    airtime = focus.airtime[stream_key]
+    await db.stream.update_many(
+        where={"key": stream_key},
+        data={
+            "focus_seconds": int(airtime.seconds),
+            "last_focused": datetime.fromtimestamp(airtime.last_focused, timezone.utc),
+        },
+    )
+
+
+async def bump_user_stats(
+    client: Prisma, user_id: str, sessions: int = 0, submitted: int = 0, approved: int = 0
+):
+    # call inside the transaction that changes the sessions themselves
+    await client.userstats.upsert(
+        where={"user_id": user_id},
+        data={
+            "create": {
+                "user_id": user_id,
+                "sessions": sessions,
+                "submitted_minutes": submitted,
+                "approved_minutes": approved,
+            },
+            "update": {
+                "sessions": {"increment": sessions},
+                "submitted_minutes": {"increment": submitted},
+                "approved_minutes": {"increment": approved},
+            },
+        },
+    )
+
+
+async def rebuild_user_stats():
+    # recount from Session, which also picks up edits made straight in the database
+    await db.execute_raw(
+        """INSERT INTO "UserStats" ("user_id", "sessions", "submitted_minutes", "approved_minutes")
+        SELECT pr."user_id", COUNT(*), SUM(s."duration"), SUM(CASE WHEN s."approved" THEN s."duration" ELSE 0 END)
+        FROM "Session" s JOIN "PullRequest" pr ON pr."id" = s."pr_id"
+        WHERE pr."user_id" IS NOT NULL GROUP BY pr."user_id"
+        ON CONFLICT ("user_id") DO UPDATE SET "sessions" = excluded."sessions",
+            "submitted_minutes" = excluded."submitted_minutes", "approved_minutes" = excluded."approved_minutes"
+        """
+    )
+
+
+def can_focus(stream_key: str) -> bool:
+    return health.eligible(stream_key, time.monotonic())
+
+
+async def update_active():
+    old_stream = registry.focused
+    new_stream = focus.pick(time.time(), can_focus)
+    if new_stream is None or new_stream == old_stream:
+        return
+    registry.set_focus(new_stream)
+    await publish_state()
+    if old_stream is None:
+        return
+    await save_airtime(old_stream)
+    # a stream deleted while live has no one left to tell
+    old_active_stream_user = await identity_for_stream(old_stream)
+    if old_active_stream_user is not None:
+        outbox.post_message(
+            channel="C07ERCGG989",
+            text=f"Hey <@{old_active_stream_user.slack_id}>, you're no longer in focus!",
         )
-        await bolt.client.chat_postMessage(
+    active_stream_user = await identity_for_stream(new_stream)
+    if active_stream_user is not None:
+        outbox.post_message(
+            # only the newest "you're in focus" notice is worth sending
+            coalesce_key="focus:C07ERCGG989",
             channel="C07ERCGG989",
-            text=f"Hey <@{active_stream_user.slack_id}>, you're in focus! Make sure to tell us what you're working on!",  # type: ignore
+            text=f"Hey <@{active_stream_user.slack_id}>, you're in focus! Make sure to tell us what you're working on!",
         )
-        return True
+    return True
+
+
+async def rotate_focus():
+    # slots run from whenever focus last changed hands, which is often not
+    # on this job's schedule (a stream going offline, a stalled publisher)
+    if focus.due(time.time()):
+        await update_active()
+
+
+async def publish_state():
+    # followers serve reads from the snapshot the leader publishes here
+    snapshot = registry.snapshot()
+    raw = snapshot.to_json()
+    snapshots.publish(snapshot.version, raw)
+    update_compositor(snapshot)
+    await store.set("streams", raw)
+
+
+def update_compositor(snapshot: Snapshot):
+    if compositor is None:
+        return
+    # only streams known to be flowing with video become inputs; anything
+    # else would fail the mixer's whole filter graph
+    now = time.monotonic()
+    names = [
+        stream.name
+        for stream in snapshot.streams
+        if health.renderable(stream.name, now)
+    ]
+    compositor.update(
+        names, snapshot.focused, [name for name in names if health.has_audio(name)]
+    )
+
+
+async def current_snapshot() -> Snapshot:
+    if leader.is_leader:
+        return registry.snapshot()
+    if relayed is not None:
+        return relayed
+    raw = await store.get("streams")
+    return Snapshot.from_json(raw) if raw else Snapshot(0, (), None)
+
+
+async def relay_state():
+    # followers pick up the leader's snapshots once a second, however many
+    # clients are subscribed to them
+    global relayed
+    if leader.is_leader:
+        relayed = None
+        return
+    if compositor is not None and compositor.running:
+        await compositor.stop()  # leadership moved to another worker
+    with metrics.JOB_SECONDS.time(job="relay_state"):
+        raw = await store.get("streams")
+        if raw:
+            relayed = Snapshot.from_json(raw)
+            snapshots.publish(relayed.version, raw)
+
+
+async def presence_changed(stream_key: str, ready: bool):
+    if not leader.is_leader:
+        # hooks land on any worker; hand them to the leader
+        await store.push("presence", json.dumps({"key": stream_key, "ready": ready}))
+        return
+    if ready:
+        await stream_ready(stream_key)
+    else:
+        await stream_not_ready(stream_key)
+
+
+async def apply_presence_events():
+    for raw in await store.pop_all("presence"):
+        event = json.loads(raw)
+        await presence_changed(event["key"], event["ready"])
+
+
+async def load_airtime():
+    for stream in await db.stream.find_many():
+        focus.load(
+            stream.key,
+            stream.focus_seconds,
+            stream.last_focused.timestamp() if stream.last_focused else 0.0,
+        )
+
+
+async def take_leadership():
+    # whatever this worker knew from an earlier term is stale by now; the
+    # previous leader saved airtime as it handed focus around
+    focus.reset()
+    await load_airtime()
+    raw = await store.get("streams")
+    if raw:
+        registry.restore(Snapshot.from_json(raw))
+    for name in registry.names():
+        focus.add(name)
+    if registry.focused is not None:
+        focus.resume(registry.focused, time.time())
+    await publish_state()
+    # catch up on anything the previous leader missed
+    global mediamtx_sync, catalog_watcher
+    mediamtx_sync = asyncio.create_task(sync_mediamtx())
+    if catalog_watcher is None:
+        catalog_watcher = asyncio.create_task(watch(catalog))
+    if compositor is not None:
+        compositor.start()
+
+
+def leader_only(job):
+    @functools.wraps(job)
+    async def run():
+        if leader.is_leader:
+            with metrics.JOB_SECONDS.time(job=job.__name__):
+                return await job()
+
+    return run
+
+
+def count_job_event(event: JobEvent):
+    if event.code == EVENT_JOB_ERROR:
+        metrics.JOB_ERRORS.inc(job=event.job_id)
+    else:
+        # max_instances: the previous run hadn't finished when this one was due
+        reason = "max_instances" if event.code == EVENT_JOB_MAX_INSTANCES else "missed"
+        metrics.JOBS_SKIPPED.inc(job=event.job_id, reason=reason)
+
+
+async def set_stream_live(stream_key: str, is_live: bool):
+    await db.stream.update_many(
+        where={"key": stream_key},
+        data={"is_live": is_live, "last_live": datetime.now(timezone.utc)},
+    )
+
+
+async def stream_ready(stream_key: str):
+    registry.add(stream_key)
+    focus.add(stream_key)
+    if registry.focused is None:
+        registry.set_focus(focus.pick(time.time(), can_focus))
+    await publish_state()
+    await set_stream_live(stream_key, True)
+
+
+async def stream_not_ready(stream_key: str):
+    was_focused = registry.focused == stream_key
+    focus.remove(stream_key, time.time())
+    registry.remove(stream_key)
+    if was_focused:
+        await save_airtime(stream_key)
+        registry.set_focus(focus.pick(time.time(), can_focus))
+    await publish_state()
+    await set_stream_live(stream_key, False)
+
+
+async def sample_publishers():
+    health.observe(await mediamtx.list_paths(), time.monotonic())
+    update_compositor(registry.snapshot())
+    if registry.focused is not None and not can_focus(registry.focused):
+        # don't leave viewers on a dead tile until the slot runs out
+        stalled = registry.focused
+        if await update_active():
+            print(f"{stalled} stalled, moved focus to {registry.focused}")
+    await store.set("health", json.dumps(health.report(time.monotonic())))
+
+
+async def probe_unprobed():
+    # segments MediaMTX has finished get probed by the segment_complete
+    # hook; this catches everything else so totals and the leaderboard
+    # count it without anyone asking for the stream's recordings
+    global probe_cursor
+    pending = await asyncio.to_thread(catalog.pending, probe_cursor, PROBE_BATCH)
+    probe_cursor = pending[-1][0] if len(pending) == PROBE_BATCH else ""
+    live = set(registry.names())
+    # whatever a live stream is still writing would only change again
+    paths = [path for path, stream_key in pending if stream_key not in live]
+    results = await asyncio.gather(
+        *[probe_service.refresh(path) for path in paths], return_exceptions=True
+    )
+    for path, result in zip(paths, results):
+        if isinstance(result, Exception):
+            print(f"probing {path} failed: {result!r}")
 
 
 async def check_for_new():
-    global active_stream
-    global active_streams
-    async with httpx.AsyncClient() as client:
-        streams_raw = (
-            await client.get(f"http://{os.environ['MEDIAMTX_IP']}:9997/v3/paths/list")
-        ).json()["items"]
-        streams_simple = []
-        for stream in streams_raw:
-            if stream["ready"]:
-                streams_simple.append(stream["name"])
-        active_streams_simple = []
-        for i in active_streams:
-            active_streams_simple.append(i["name"])
-            if active_stream == {}:
-                active_stream = {"name": i["name"], "ready": True}
-        for stream in active_streams_simple:
-            if stream not in streams_simple:
-                active_streams.remove(
-                    next(item for item in active_streams if item["name"] == stream)
-                )
-                active_stream = choice(active_streams)
-        for stream in streams_simple:
-            if stream not in active_streams_simple:
-                active_streams.append({"name": stream, "ready": True})
-        if len(active_streams) == 0:
-            active_stream = {}
+    # MediaMTX's runOnReady/runOnNotReady hooks keep state up to date; this
+    # only catches hooks that were missed, e.g. while the backend restarted
+    live = {stream.name for stream in await mediamtx.list_paths() if stream.ready}
+    known = set(registry.names())
+    # same rule as the runOnReady hook: only paths that are a stream's key
+    new = sorted(live - known)
+    found = await asyncio.gather(*[identity_for_stream(key) for key in new])
+    live -= {key for key, identity in zip(new, found) if identity is None}
+    for stream_key in known - live:
+        await stream_not_ready(stream_key)
+    for stream_key in live - known:
+        await stream_ready(stream_key)
+    now = datetime.now(timezone.utc)
+    await db.stream.update_many(
+        where={"key": {"in": list(live)}, "is_live": False},
+        data={"is_live": True, "last_live": now},
+    )
+    await db.stream.update_many(
+        where={"key": {"not_in": list(live)}, "is_live": True},
+        data={"is_live": False, "last_live": now},
+    )
+
+
+async def existing_stream_keys(keys: Set[str]) -> Set[str]:
+    streams = await db.stream.find_many(where={"key": {"in": list(keys)}})
+    return {stream.key for stream in streams}
+
+
+async def sync_mediamtx():
+    global last_path_reconcile
+    try:
+        last_path_reconcile = await reconcile_paths(
+            mediamtx,
+            [stream.key for stream in await db.stream.find_many()],
+            concurrency=int(os.environ.get("RECONCILE_CONCURRENCY", "8")),
+            # a streamer approved since the keys were read
+            existing=existing_stream_keys,
+        )
+        await check_for_new()
+    except Exception as e:
+        print(f"startup sync with MediaMTX failed, check_for_new will retry: {e!r}")
+        return
+    startup_seconds.setdefault("mediamtx_sync", time.monotonic() - PROCESS_STARTED)
+    print(
+        f"MediaMTX paths reconciled in {last_path_reconcile.seconds:.2f}s "
+        f"(+{len(last_path_reconcile.added)} -{len(last_path_reconcile.removed)} "
+        f"!{len(last_path_reconcile.failed)}), "
+        f"{time.monotonic() - PROCESS_STARTED:.2f}s after the process started"
+    )
 
 
 @asynccontextmanager
 async def lifespan(_):
     await db.connect()
-    async with httpx.AsyncClient() as client:
-        for stream in await db.stream.find_many():
-            await client.post(
-                f"http://{os.environ['MEDIAMTX_IP']}:9997/v3/config/paths/add/"
-                + stream.key,
-                json={"name": stream.key},
-            )
+    await rebuild_user_stats()
+    catalog.connect()
+    probe_service.start()
+    sheets.start()
+    await mediamtx.start()
+    identities.load(await db.user.find_many(include={"stream": True}))
+    await store.connect()
+    await leader.campaign()
+    leader.start()
+    if os.environ.get("RECONCILE_IN_BACKGROUND", "1") != "1" and mediamtx_sync:
+        await mediamtx_sync
+    outbox.start()
+    await slack_users.start()
+    global loop_lag_watcher
+    loop_lag_watcher = asyncio.create_task(metrics.watch_loop_lag())
+    scheduler.add_listener(
+        count_job_event, EVENT_JOB_ERROR | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED
+    )
     scheduler.start()
-    scheduler.add_job(update_active, IntervalTrigger(minutes=5))
-    scheduler.add_job(check_for_new, IntervalTrigger(seconds=3))
-    scheduler.add_job(rotate_fernet_key, IntervalTrigger(minutes=30))
-    await rotate_fernet_key()
+    # every worker runs the scheduler, but these jobs only do work on the leader
+    scheduler.add_job(
+        leader_only(rotate_focus),
+        IntervalTrigger(seconds=float(os.environ.get("FOCUS_CHECK_SECONDS", "5"))),
+        id="rotate_focus",
+    )
+    scheduler.add_job(
+        leader_only(check_for_new),
+        IntervalTrigger(seconds=int(os.environ.get("RECONCILE_SECONDS", "60"))),
+        id="check_for_new",
+    )
+    scheduler.add_job(
+        leader_only(apply_presence_events),
+        IntervalTrigger(seconds=1),
+        id="apply_presence_events",
+    )
+    scheduler.add_job(
+        leader_only(probe_unprobed),
+        IntervalTrigger(seconds=float(os.environ.get("PROBE_UNPROBED_SECONDS", "30"))),
+        id="probe_unprobed",
+    )
+    scheduler.add_job(relay_state, IntervalTrigger(seconds=1), id="relay_state")
+    scheduler.add_job(
+        leader_only(sample_publishers),
+        IntervalTrigger(seconds=HEALTH_SAMPLE_SECONDS),
+        id="sample_publishers",
+    )
+    scheduler.add_job(
+        leader_only(keyring.rotate),
+        IntervalTrigger(minutes=float(os.environ.get("FERNET_ROTATE_MINUTES", "30"))),
+        id="rotate",
+    )
+    await keyring.load()
+    startup_seconds["serving"] = time.monotonic() - PROCESS_STARTED
     yield
+    if mediamtx_sync:
+        mediamtx_sync.cancel()
+    if catalog_watcher:
+        catalog_watcher.cancel()
+    if loop_lag_watcher:
+        loop_lag_watcher.cancel()
+    if compositor is not None:
+        await compositor.stop()
     scheduler.shutdown()
+    await leader.stop()
+    await store.close()
+    await outbox.stop()
+    await slack_users.close()
+    sheets.shutdown()
+    probe_service.shutdown()
+    await mediamtx.close()
+    catalog.disconnect()
     await db.disconnect()
 
 
@@ -199,15 +613,84 @@ api.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+api.add_middleware(metrics.HTTPMetricsMiddleware)
+
+
+class TimedPrisma(Prisma):
+    # every generated query method funnels through _execute
+    async def _execute(self, *, method, arguments, model=None, root_selection=None):
+        with metrics.DB_SECONDS.time(
+            model=model.__name__ if model else "raw", method=method
+        ):
+            return await super()._execute(
+                method=method,
+                arguments=arguments,
+                model=model,
+                root_selection=root_selection,
+            )
 
-db = Prisma()
+
+db = TimedPrisma(
+    datasource={"url": os.environ["DATABASE_URL"]} if "DATABASE_URL" in os.environ else None
+)
+
+mediamtx = MediaMTXClient(
+    os.environ.get("MEDIAMTX_URL") or f"http://{os.environ['MEDIAMTX_IP']}:9997",
+    timeout=float(os.environ.get("MEDIAMTX_TIMEOUT", "5")),
+)
+
+catalog = RecordingCatalog()
+
+# the broadcast: the leader runs ffmpeg over the live streams' RTSP feeds
+COMPOSITOR_OUTPUT = os.environ.get("COMPOSITOR_OUTPUT") or (
+    f"rtmp://x.rtmp.youtube.com/live2/{os.environ['YT_STREAM_KEY']}"
+    if os.environ.get("YT_STREAM_KEY")
+    else None
+)
+compositor = (
+    Compositor(
+        COMPOSITOR_OUTPUT,
+        rtsp_source(
+            os.environ.get("COMPOSITOR_RTSP_URL")
+            or f"rtsp://{os.environ.get('MEDIAMTX_IP', '127.0.0.1')}:8554"
+        ),
+    )
+    if COMPOSITOR_OUTPUT
+    else None
+)
+
+probe_service = ProbeService(
+    catalog,
+    workers=int(os.environ.get("PROBE_WORKERS", "2")),
+    timeout=float(os.environ.get("PROBE_TIMEOUT", "10")),
+)
+# contact sheets of submitted sessions for reviewers
+sheets = ContactSheets(
+    catalog,
+    probe_service,
+    max_bytes=int(float(os.environ.get("SHEET_CACHE_MB", "512")) * 1024 * 1024),
+    workers=int(os.environ.get("SHEET_WORKERS", "1")),
+    max_prefetch=int(os.environ.get("SHEET_PREFETCH", "64")),
+)
 
 bolt = AsyncApp(
-    token=os.environ["SLACK_TOKEN"], signing_secret=os.environ["SLACK_SIGNING_SECRET"]
+    client=TimedWebClient(
+        token=os.environ["SLACK_TOKEN"],
+        base_url=os.environ.get("SLACK_API_URL", "https://slack.com/api/"),
+    ),
+    signing_secret=os.environ["SLACK_SIGNING_SECRET"],
 )
 
 bolt_handler = AsyncSlackRequestHandler(bolt)
 
+outbox = SlackOutbox(bolt.client)
+
+slack_users = SlackDirectory(
+    bolt.client,
+    profile_ttl=float(os.environ.get("SLACK_PROFILE_TTL", "3600")),
+    ineligible_ttl=float(os.environ.get("INELIGIBLE_TTL", "60")),
+)
+
 
 @api.get("/auth/github/login")
 async def github_redirect(request: Request):
@@ -232,9 +715,13 @@ async def github_redirect(request: Request):
 async def github_callback(request: Request):
     code: str = request.query_params["code"]
     state: str = request.query_params["state"]
-    user_id, pr_id = FERNET.decrypt(bytes.fromhex(state)).decode().split("+")
-    if user_id in FERNET_KEY_USERS:
-        FERNET_KEY_USERS.remove(user_id)
+    try:
+        user_id, pr_id = (await keyring.decrypt(bytes.fromhex(state))).decode().split("+")
+    except (InvalidToken, TokenExpired, ValueError):
+        return HTMLResponse(
+            "<h1>This link has expired! Please run /onboard-live-submit again.</h1>",
+            status_code=400,
+        )
     db_user = await db.user.find_first_or_raise(where={"slack_id": user_id})
     user_stream_key = (
         await db.stream.find_first_or_raise(where={"user_id": db_user.id})
@@ -243,7 +730,7 @@ async def github_callback(request: Request):
     async with httpx.AsyncClient() as client:
         token = (
             await client.post(
-                "https://github.com/login/oauth/access_token",
+                f"{GITHUB_URL}/login/oauth/access_token",
                 json={
                     "client_id": os.environ["GH_CLIENT_ID"],
                     "client_secret": os.environ["GH_CLIENT_SECRET"],
@@ -256,7 +743,7 @@ async def github_callback(request: Request):
 
         gh_user: int = (
             await client.get(
-                "https://api.github.com/user",
+                f"{GITHUB_API_URL}/user",
                 headers={
                     "Accept": "application/vnd.github.v3+json",
                     "Authorization": f"Bearer {token}",
@@ -273,7 +760,10 @@ async def github_callback(request: Request):
                 return HTMLResponse(
                     "<h1>You don't have any sessions to submit! Please DM @mra on Slack if you think this is a mistake.</h1>"
                 )
-            await bolt.client.chat_postMessage(
+            durations = await asyncio.gather(
+                *[get_recording_minutes(recording) for recording in stream_recs]
+            )
+            outbox.post_message(
                 channel=user_id,
                 text="Select your OnBoard Live sessions!",
                 blocks=[
@@ -299,15 +789,13 @@ async def github_callback(request: Request):
                             "type": "mrkdwn",
                             "text": "\n".join(
                                 [
-                                    recording
+                                    recording.start
                                     + " for "
-                                    + str(
-                                        get_recording_duration(
-                                            recording, user_stream_key
-                                        )
-                                    )
+                                    + (str(duration) if duration is not None else "?")
                                     + " minutes"
-                                    for recording in stream_recs
+                                    for recording, duration in zip(
+                                        stream_recs, durations
+                                    )
                                 ]
                             ),  # type: ignore
                         },
@@ -411,14 +899,350 @@ async def get_stream_by_key(stream_key: str):
     )
 
 
+@api.get("/api/v1/review/sessions")
+async def get_review_queue(
+    request: Request,
+    status: str = "pending",
+    pr: int | None = None,
+    user_id: str | None = None,
+    cursor: str | None = None,
+    limit: int = 50,
+):
+    # oldest first, resumed after the last session ID of the previous page
+    verify_review_token(request.headers.get("authorization"))
+    statuses = {
+        "pending": {"reviewed": False},
+        "approved": {"reviewed": True, "approved": True},
+        "rejected": {"reviewed": True, "approved": False},
+        "all": {},
+    }
+    if status not in statuses:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(statuses)}")
+    limit = min(max(limit, 1), REVIEW_PAGE_MAX)
+    where: dict = dict(statuses[status])
+    pull: dict = {}
+    if pr is not None:
+        pull["github_id"] = pr
+    if user_id is not None:
+        pull["user_id"] = user_id
+    if pull:
+        where["pull"] = {"is": pull}
+    if cursor:
+        where["id"] = {"gt": cursor}
+    sessions = await db.session.find_many(
+        where=where,  # type: ignore
+        order={"id": "asc"},
+        take=limit + 1,
+        include={"pull": {"include": {"user": True}}},
+    )
+    page = sessions[:limit]
+    return {
+        "sessions": [
+            {
+                "id": session.id,
+                "pr": session.pull.github_id,  # type: ignore
+                "user_id": session.pull.user_id,  # type: ignore
+                "name": session.pull.user.name if session.pull.user else None,  # type: ignore
+                "timestamp": session.timestamp,
+                "filename": session.filename,
+                "duration": session.duration,
+                "reviewed": session.reviewed,
+                "approved": session.approved,
+            }
+            for session in page
+        ],
+        "next_cursor": page[-1].id if len(sessions) > limit else None,
+    }
+
+
+@api.post("/api/v1/review/sessions")
+async def review_sessions(request: Request):
+    # {"ids": [session ID, ...], "approved": true|false}, all or nothing
+    verify_review_token(request.headers.get("authorization"))
+    body = json.loads(await request.body())
+    ids, approved = body.get("ids"), body.get("approved")
+    if (
+        not isinstance(ids, list)
+        or not all(isinstance(i, str) for i in ids)
+        or not isinstance(approved, bool)
+    ):
+        raise HTTPException(status_code=400, detail="Expected a list of ids and approved: bool")
+    ids = list(dict.fromkeys(ids))
+    async with db.tx() as transaction:
+        sessions = await transaction.session.find_many(
+            where={"id": {"in": ids}}, include={"pull": True}
+        )
+        await transaction.session.update_many(
+            where={"id": {"in": ids}}, data={"reviewed": True, "approved": approved}
+        )
+        # only sessions whose verdict flips move the approved minutes
+        approved_minutes: Dict[str, int] = {}
+        for session in sessions:
+            if session.pull and session.pull.user_id and session.approved != approved:
+                delta = session.duration if approved else -session.duration
+                approved_minutes[session.pull.user_id] = (
+                    approved_minutes.get(session.pull.user_id, 0) + delta
+                )
+        for user_id, minutes in approved_minutes.items():
+            await bump_user_stats(transaction, user_id, approved=minutes)
+    found = {session.id for session in sessions}
+    return {"reviewed": len(found), "missing": [i for i in ids if i not in found]}
+
+
+@api.get("/api/v1/review/sessions/{session_id}/clip")
+async def get_session_clip(
+    request: Request, session_id: str, start: float = 0.0, length: float = 60.0
+):
+    # start is seconds into the session's recording; the clip runs on into
+    # the following segments if the broadcast continued
+    verify_review_token(request.headers.get("authorization"))
+    start = max(start, 0.0)
+    end = start + min(max(length, 1.0), CLIP_MAX_SECONDS)
+    session = await db.session.find_unique(
+        where={"id": session_id},
+        include={"pull": {"include": {"user": {"include": {"stream": True}}}}},
+    )
+    if session is None or session.pull is None or session.pull.user is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    stream = session.pull.user.stream
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Session has no stream")
+    # older sessions kept MediaMTX's timestamp, which trims the fraction
+    started = parse_start(session.timestamp)
+    until = started + timedelta(seconds=end)
+    segments = await asyncio.to_thread(
+        catalog.between,
+        stream.key,
+        started.strftime(START_FORMAT),
+        until.strftime(START_FORMAT),
+    )
+    if not segments or segments[0].start != started.strftime(START_FORMAT):
+        raise HTTPException(status_code=404, detail="Recording not found")
+    # a segment without a duration gets its keyframe index from the same
+    # probe; cut() trims the whole file for any that still has none
+    durations = await asyncio.gather(
+        *[probe_service.duration(segment.path) for segment in segments]
+    )
+    pieces = plan_clip(
+        [(s.path, s.start, seconds) for s, seconds in zip(segments, durations)], start, end
+    )
+    if not pieces:
+        raise HTTPException(status_code=416, detail="Nothing was recorded in that range")
+    indexes = await asyncio.gather(
+        *[asyncio.to_thread(catalog.keyframes, piece.path) for piece in pieces]
+    )
+    sizes = {segment.path: segment.size for segment in segments}
+    slices = [
+        cut(piece, index, sizes[piece.path]) for piece, index in zip(pieces, indexes)
+    ]
+
+    async def body():
+        async with clip_slots:
+            async for chunk in stream_clip(slices):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type="video/mp4",
+        headers={
+            "Content-Disposition": f'inline; filename="{session_id}-{int(start)}.mp4"',
+            "X-Source-Bytes": str(sum(piece.source_bytes for piece in slices)),
+        },
+    )
+
+
+@api.get("/api/v1/review/sessions/{session_id}/sheet")
+async def get_session_sheet(request: Request, session_id: str):
+    verify_review_token(request.headers.get("authorization"))
+    session = await db.session.find_unique(where={"id": session_id})
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    try:
+        sheet = await sheets.get(local_recording_path(session.filename))
+    except Exception:
+        raise HTTPException(status_code=500, detail="Couldn't render a contact sheet")
+    if sheet is None:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    path, key = sheet
+    # the key changes with the recording, so a sheet never goes stale
+    headers = {"ETag": f'"{key[:32]}"', "Cache-Control": "private, max-age=86400"}
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+
+@api.post("/api/v1/mediamtx/segment_complete")
+async def segment_complete(request: Request, path: str):
+    # called by MediaMTX's runOnRecordSegmentComplete hook
+    verify_hook_secret(request.headers.get("x-hook-secret"))
+    if not os.path.realpath(path).startswith(RECORDINGS_ROOT + "/"):
+        raise HTTPException(status_code=400, detail="Not a recording path")
+    await probe_service.refresh(path)
+    return
+
+
+@api.post("/api/v1/mediamtx/ready")
+async def mediamtx_ready(request: Request, path: str):
+    # called by MediaMTX's runOnReady hook when a publisher starts
+    verify_hook_secret(request.headers.get("x-hook-secret"))
+    if await identity_for_stream(path) is None:
+        raise HTTPException(status_code=404, detail="Unknown stream")
+    await presence_changed(path, True)
+    return
+
+
+@api.post("/api/v1/mediamtx/not_ready")
+async def mediamtx_not_ready(request: Request, path: str):
+    # called by MediaMTX's runOnNotReady hook when a publisher stops
+    verify_hook_secret(request.headers.get("x-hook-secret"))
+    if await identity_for_stream(path) is None:
+        raise HTTPException(status_code=404, detail="Unknown stream")
+    await presence_changed(path, False)
+    return
+
+
+@api.get("/api/v1/identity_cache")
+async def get_identity_cache_stats():
+    return {**identities.stats(), "slack": slack_users.stats(), "sheets": sheets.stats()}
+
+
+@api.get("/api/v1/startup")
+async def get_startup_stats():
+    return {
+        "seconds": startup_seconds,
+        "path_reconcile": last_path_reconcile,
+    }
+
+
 @api.get("/api/v1/active_stream")
 async def get_active_stream():
-    return active_stream["name"] if "name" in active_stream else ""
+    return (await current_snapshot()).focused or ""
+
+
+def public_id(stream_key: str) -> str:
+    # stream keys are publish credentials; the public API only ever shows
+    # this stand-in, which can't be turned back into the key
+    return hashlib.sha256(stream_key.encode()).hexdigest()[:16]
+
+
+async def render_streams(snapshot: Snapshot) -> Tuple[int, bytes, str]:
+    global streams_body
+    if streams_body is None or streams_body[0] != snapshot.version:
+        streamers = await asyncio.gather(
+            *[identity_for_stream(stream.name) for stream in snapshot.streams]
+        )
+        body = json.dumps(
+            {
+                "version": snapshot.version,
+                "focused": public_id(snapshot.focused) if snapshot.focused else None,
+                "streams": [
+                    {
+                        "id": public_id(stream.name),
+                        "name": streamer.name if streamer else None,
+                        "live_since": stream.live_since.isoformat(),
+                        "focused": stream.name == snapshot.focused,
+                    }
+                    for stream, streamer in zip(snapshot.streams, streamers)
+                ],
+            }
+        ).encode()
+        # hash the body rather than use the version so every worker agrees
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        streams_body = (snapshot.version, body, etag)
+    return streams_body
+
+
+@api.get("/api/v1/streams")
+async def get_streams(request: Request):
+    _, body, etag = await render_streams(await current_snapshot())
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@api.get("/api/v1/leaderboard")
+async def get_leaderboard(limit: int = 25, offset: int = 0):
+    limit = min(max(limit, 1), LEADERBOARD_MAX_LIMIT)
+    offset = max(offset, 0)
+    total, ranking = await asyncio.to_thread(catalog.ranking, limit, offset)
+    streams = {
+        stream.key: stream
+        for stream in await db.stream.find_many(
+            where={"key": {"in": [stream_key for stream_key, _, _ in ranking]}},
+            include={"user": {"include": {"stats": True}}},
+        )
+    }
+    snapshot = await current_snapshot()
+    entries = []
+    for rank, (stream_key, segments, seconds) in enumerate(ranking, offset + 1):
+        stream = streams.get(stream_key)
+        if stream is None or stream.user is None:
+            continue  # recordings left over from a deleted stream
+        stats = stream.user.stats
+        entries.append(
+            {
+                "rank": rank,
+                "name": stream.user.name,
+                "minutes": int(seconds / 60),
+                "segments": segments,
+                "live": stream_key in snapshot,
+                "last_live": stream.last_live.isoformat() if stream.last_live else None,
+                "sessions": stats.sessions if stats else 0,
+                "submitted_minutes": stats.submitted_minutes if stats else 0,
+                "approved_minutes": stats.approved_minutes if stats else 0,
+            }
+        )
+    return {"total": total, "limit": limit, "offset": offset, "entries": entries}
+
+
+@api.get("/api/v1/health")
+async def get_publisher_health():
+    # bitrate, stall state and tracks for every live path
+    if leader.is_leader:
+        return health.report(time.monotonic())
+    raw = await store.get("health")
+    return json.loads(raw) if raw else {}
+
+
+@api.get("/metrics")
+async def get_metrics():
+    # per worker: with WEB_CONCURRENCY > 1 each scrape sees one process
+    snapshot = await current_snapshot()
+    metrics.LIVE_STREAMS.set(len(snapshot.streams))
+    metrics.REGISTRY_VERSION.set(snapshot.version)
+    metrics.FOCUSED_STREAM.clear()
+    if snapshot.focused is not None:
+        metrics.FOCUSED_STREAM.set(1, stream=public_id(snapshot.focused))
+    metrics.EVENT_SUBSCRIBERS.set(snapshots.subscribers)
+    if leader.is_leader:
+        now = time.monotonic()
+        metrics.STALLED_STREAMS.set(sum(health.stalled(name, now) for name in health.paths))
+    metrics.IS_LEADER.set(int(leader.is_leader))
+    metrics.MEDIAMTX_CIRCUIT_OPEN.set(int(mediamtx.opened_at is not None))
+    metrics.SLACK_PENDING.clear()
+    for method, lane in outbox.lanes.items():
+        metrics.SLACK_PENDING.set(len(lane.pending), method=method)
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@api.get("/api/v1/events")
+async def stream_events(request: Request):
+    # server-sent events: one snapshot frame now, then one per registry change
+    if snapshots.version < 0:
+        snapshot = await current_snapshot()
+        snapshots.publish(snapshot.version, snapshot.to_json())
+    last_event_id = request.headers.get("last-event-id", "")
+    return StreamingResponse(
+        snapshots.subscribe(int(last_event_id) if last_event_id.isdigit() else -1),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @bolt.event("app_home_opened")
-async def handle_app_home_opened_events(event, client):
-    await client.views_publish(
+async def handle_app_home_opened_events(event):
+    await bolt.client.views_publish(
         user_id=event["user"],
         # the view object that appears in the app home
         view={
@@ -446,7 +1270,9 @@ async def submit_sessions(ack: AsyncAck, body):
     for session in body["state"]["values"]["session-input"]["plain_text_input-action"][
         "value"
     ].split("\n"):
-        selected_sessions_ts.append(session.split(" for ")[0])
+        if session.strip():
+            selected_sessions_ts.append(session.split(" for ")[0].strip())
+    selected_sessions_ts = list(dict.fromkeys(selected_sessions_ts))
 
     pr_id = int(
         body["message"]["blocks"][1]["text"]["text"].split("#")[1].split(":")[0]
@@ -456,17 +1282,68 @@ async def submit_sessions(ack: AsyncAck, body):
         stream_key = (
             await db.stream.find_first_or_raise(where={"user_id": db_pr.user_id})
         ).key
-        for session in selected_sessions_ts:
-            await db.session.create(
-                {
-                    "pull": {"connect": {"id": db_pr.id}},
-                    "timestamp": session,
-                    "filename": f"/home/onboard/recordings/{stream_key}/{datetime.strptime(session, '%Y-%m-%dT%H:%M:%S.%fZ').strftime('%Y-%m-%d_%H-%M-%S-%f')}.mp4",
-                    "duration": get_recording_duration(session, stream_key),
+        filenames = {
+            session: recording_path(session, stream_key, HOST_RECORDINGS_ROOT)
+            for session in selected_sessions_ts
+        }
+        # probe before the transaction so it isn't held open meanwhile
+        durations = dict(
+            zip(
+                selected_sessions_ts,
+                await asyncio.gather(
+                    *[
+                        get_recording_duration(session, stream_key)
+                        for session in selected_sessions_ts
+                    ]
+                ),
+            )
+        )
+        new_sessions: List[str] = []
+        try:
+            async with db.tx() as transaction:
+                # Session.filename is unique, so skip anything already
+                # submitted instead of failing halfway through the batch
+                already_submitted = {
+                    session.filename
+                    for session in await transaction.session.find_many(
+                        where={"filename": {"in": list(filenames.values())}}
+                    )
                 }
+                new_sessions = [
+                    session
+                    for session in selected_sessions_ts
+                    if filenames[session] not in already_submitted
+                ]
+                if new_sessions:
+                    await transaction.session.create_many(
+                        data=[
+                            {
+                                "pr_id": db_pr.id,
+                                "timestamp": session,
+                                "filename": filenames[session],
+                                "duration": durations[session],
+                            }
+                            for session in new_sessions
+                        ]
+                    )
+                    await bump_user_stats(
+                        transaction,
+                        db_pr.user_id,
+                        sessions=len(new_sessions),
+                        submitted=sum(durations[session] for session in new_sessions),
+                    )
+        except UniqueViolationError:
+            # the same sessions were submitted concurrently, e.g. a double
+            # click; nothing from this batch was saved
+            outbox.post_message(
+                channel=body["container"]["channel_id"],
+                text="Some of those sessions were just submitted from somewhere else, so none of this batch was saved. Press Submit again to add the rest!",
             )
-        await bolt.client.chat_delete(
-            channel=body["container"]["channel_id"], ts=body["message"]["ts"]
+            return
+        for session in new_sessions:
+            sheets.schedule(recording_path(session, stream_key))
+        outbox.enqueue(
+            "chat.delete", channel=body["container"]["channel_id"], ts=body["message"]["ts"]
         )
         print(pr_id, selected_sessions_ts)
 
@@ -481,10 +1358,10 @@ async def deny(ack, body):
     applicant_name = message["blocks"][len(message) - 7]["text"]["text"].split(
         "Name: "
     )[1]  # oops i did it again
-    await bolt.client.chat_delete(
-        channel=body["container"]["channel_id"], ts=message["ts"]
+    outbox.enqueue(
+        "chat.delete", channel=body["container"]["channel_id"], ts=message["ts"]
     )
-    await bolt.client.chat_postMessage(
+    outbox.post_message(
         channel=body["container"]["channel_id"],
         text=f"{applicant_name}'s application has been denied! Remember to reach out to them if this is a fixable issue. Their username is <@{applicant_slack_id}>.",
     )
@@ -500,14 +1377,14 @@ async def approve(ack, body):
     applicant_name = message["blocks"][len(message) - 7]["text"]["text"].split(
         "Name: "
     )[1]  # oops i did it again
-    await bolt.client.chat_delete(
-        channel=body["container"]["channel_id"], ts=message["ts"]
+    outbox.enqueue(
+        "chat.delete", channel=body["container"]["channel_id"], ts=message["ts"]
     )
-    await bolt.client.chat_postMessage(
+    outbox.post_message(
         channel=body["container"]["channel_id"],
         text=f"{applicant_name}'s application has been approved! Their username is <@{applicant_slack_id}>.",
     )
-    if applicant_slack_id in [d.slack_id for d in await db.user.find_many()]:  # type: ignore
+    if await identity_for_slack_id(applicant_slack_id) is not None:
         return
     new_user = await db.user.create(
         {"slack_id": applicant_slack_id, "name": applicant_name}
@@ -515,17 +1392,12 @@ async def approve(ack, body):
     new_stream = await db.stream.create(
         {"user": {"connect": {"id": new_user.id}}, "key": token_hex(16)}
     )
-    sumbitter_convo = await bolt.client.conversations_open(
-        users=applicant_slack_id, return_im=True
+    identities.put(new_user, new_stream)
+    submitter_channel, _ = await asyncio.gather(
+        slack_users.dm_channel(applicant_slack_id), mediamtx.add_path(new_stream.key)
     )
-    async with httpx.AsyncClient() as client:
-        await client.post(
-            f"http://{os.environ['MEDIAMTX_IP']}:9997/v3/config/paths/add/"
-            + new_stream.key,
-            json={"name": new_stream.key},
-        )
-    await bolt.client.chat_postMessage(
-        channel=sumbitter_convo["channel"]["id"],
+    outbox.post_message(
+        channel=submitter_channel,
         text=f"Welcome to OnBoard Live! Your stream key is {new_stream.key}. To use your stream key the easy way, go to <https://live.onboard.hackclub.com/{new_stream.key}/publish|this link>. You can also use it in OBS with the server URL of rtmp://live.onboard.hackclub.com:1935",
     )
 
@@ -534,29 +1406,21 @@ async def approve(ack, body):
 async def handle_application_submission(ack, body):
     await ack()
     user = body["user"]["id"]
-    sumbitter_convo = await bolt.client.conversations_open(users=user, return_im=True)
-    user_real_name = (await bolt.client.users_info(user=user))["user"]["real_name"]
-    user_verified = ""
-    async with httpx.AsyncClient() as client:
-        user_verified = (
-            "Eligible L"
-            not in (
-                await client.request(
-                    url="https://verify.hackclub.dev/api/status",
-                    method="GET",
-                    content=json.dumps({"slack_id": user}),
-                )
-            ).text
-        )
-    await bolt.client.chat_postMessage(
-        channel=sumbitter_convo["channel"]["id"],
+    # one round trip for whichever of these aren't cached yet
+    submitter_channel, user_real_name, user_verified = await asyncio.gather(
+        slack_users.dm_channel(user),
+        slack_users.real_name(user),
+        slack_users.is_eligible(user),
+    )
+    outbox.post_message(
+        channel=submitter_channel,
         text=f"Your application has been submitted! We will review it shortly. Please do not send another application - If you haven't heard back in over 48 hours, or you forgot something in your application, please message <@{os.environ['ADMIN_SLACK_ID']}>! Here's a copy of your responses for your reference:\nSome info on your project(s): {body['view']['state']['values']['project-info']['project-info-body']['value']}\n{f'Please fill out <https://forms.hackclub.com/eligibility?program=Onboard%20Live&slack_id={user}|the verification form>! We can only approve your application once this is done.' if not user_verified else ''}",
     )
     will_behave = True
     # boxes = body["view"]["state"]["values"]["kAgeY"]["checkboxes"]["selected_options"]
     # if len(boxes) == 1 and boxes[0]["value"] == "value-1":
     #     will_behave = True
-    await bolt.client.chat_postMessage(
+    outbox.post_message(
         channel=os.environ["ADMIN_SLACK_ID"],
         text="New OnBoard Live application!",
         blocks=[
@@ -644,33 +1508,43 @@ async def status_command(ack: AsyncAck, command):
     user_id = command["user_id"]
     channel_id = command["channel_id"]
     try:
-        db_user = await db.user.find_first_or_raise(where={"slack_id": user_id})
-        user_stream_key = (
-            await db.stream.find_first_or_raise(where={"user_id": db_user.id})
-        ).key
-        stream_recs = await get_recording_list(user_stream_key)
-        if stream_recs is None:
+        identity = await identity_for_slack_id(user_id)
+        if identity is None or identity.stream_key is None:
+            raise LookupError(f"{user_id} has no stream")
+        user_stream_key = identity.stream_key
+        page = int(command["text"]) if command["text"].strip().isdigit() else 1
+        (count, total_seconds), stats = await asyncio.gather(
+            get_recording_totals(user_stream_key),
+            db.userstats.find_unique(where={"user_id": identity.user_id}),
+        )
+        if count == 0:
             await bolt.client.chat_postEphemeral(
                 channel=channel_id,
                 user=user_id,
                 text=f"You don't have any recorded streams! Please message <@U05C64XMMHV> if you think this is a mistake."
             )
-        total_streamed = sum([get_recording_duration(recording, user_stream_key) for recording in stream_recs])
+            return
+        pages = -(-count // STATUS_PAGE_SIZE)
+        page = min(max(page, 1), pages)
+        stream_recs = await get_recording_list(
+            user_stream_key, STATUS_PAGE_SIZE, (page - 1) * STATUS_PAGE_SIZE
+        )
+        durations = await asyncio.gather(*[get_recording_minutes(recording) for recording in stream_recs])
+        total_streamed = int(total_seconds / 60)
+        submitted = stats.submitted_minutes if stats else 0
+        approved = stats.approved_minutes if stats else 0
         all_recs = "\n".join([
-            recording
+            recording.start
             + " for "
-            + str(
-                get_recording_duration(
-                    recording, user_stream_key
-                )
-            )
+            + (str(duration) if duration is not None else "?")
             + " minutes"
-            for recording in stream_recs
+            for recording, duration in zip(stream_recs, durations)
         ])
+        is_live = user_stream_key in await current_snapshot()
         await bolt.client.chat_postEphemeral(
             channel=channel_id,
             user=user_id,
-            text=f"The server currently thinks you are {"live" if user_stream_key in [stream for stream in active_streams] else "not live"}! It looks like you've streamed for a total of {total_streamed} minutes. Here are all of your recordings: ```{all_recs}```"
+            text=f"The server currently thinks you are {"live" if is_live else "not live"}! It looks like you've streamed for a total of {total_streamed} minutes, and submitted {submitted} minutes ({approved} approved so far). Here are your recordings (page {page} of {pages}, use `/onboard-live-status <page>` to see the others): ```{all_recs}```"
         )
     except Exception:
         await bolt.client.chat_postEphemeral(
@@ -693,12 +1567,13 @@ async def submit(ack: AsyncAck, command):
             text="There doesn't seem to be a PR open with that ID! If this seems like a mistake, please message <@U05C64XMMHV> about it! Note that all new OnBoard Live PRs must be marked as such before this command will accept them. This has to be done manually by an OnBoard reviewer or <@U05C64XMMHV>! Once that's done, please don't bug the OnBoard reviewers, as <@U05C64XMMHV> is the only one who can review your OnBoard Live grant! Feel free to DM her if it's taking a while.",
         )
         return
-    if user_id not in FERNET_KEY_USERS:
-        FERNET_KEY_USERS.append(user_id)
+    state = await keyring.encrypt(
+        bytes(f"{user_id}+{db_pr.github_id}", "utf-8"), ttl=STATE_TOKEN_TTL
+    )
     await bolt.client.chat_postEphemeral(
         channel=channel_id,
         user=user_id,
-        text=f"Please <https://live.onboard.hackclub.com/auth/github/login?state={FERNET.encrypt(bytes(f'{user_id}+{db_pr.github_id}', 'utf-8')).hex()}|click here> to authenticate with GitHub. This helps us verify that this is your PR!",
+        text=f"Please <https://live.onboard.hackclub.com/auth/github/login?state={state.hex()}|click here> to authenticate with GitHub. This helps us verify that this is your PR!",
     )
 
 
@@ -897,7 +1772,13 @@ async def slack_event_endpoint(req: Request):
 
 
 def main():
-    uvicorn.run(api)
+    # uvicorn also reads WEB_CONCURRENCY itself when started from the CLI
+    uvicorn.run(
+        "main:api",
+        workers=int(os.environ.get("WEB_CONCURRENCY", "1")),
+        # open event streams never finish on their own
+        timeout_graceful_shutdown=5,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import httpx
+
+import metrics
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+@dataclass
+class PathInfo:
+    name: str
+    ready: bool
+    bytes_received: int = 0
+    tracks: Tuple[str, ...] = ()
+
+
+class MediaMTXClient:
+    """Long-lived client for the MediaMTX control API (port 9997).
+
+    One pooled keep-alive connection set is shared by every caller. Failed
+    requests are retried with jittered exponential backoff, and after
+    failure_threshold consecutive failures the circuit opens: calls fail fast
+    with CircuitOpenError for reset_after seconds instead of piling up.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 5.0,
+        retries: int = 2,
+        failure_threshold: int = 5,
+        reset_after: float = 30.0,
+    ):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.client: httpx.AsyncClient
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        )
+
+    async def close(self):
+        await self.client.aclose()
+
+    def _check_circuit(self):
+        if self.opened_at is None:
+            return
+        if time.monotonic() - self.opened_at < self.reset_after:
+            raise CircuitOpenError(f"MediaMTX API circuit open, retrying after {self.reset_after}s")
+        # half-open: let this request through, one more failure re-opens
+        self.opened_at = None
+        self.failures = self.failure_threshold - 1
+
+    def _record(self, ok: bool):
+        if ok:
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    async def _request(
+        self, method: str, url: str, op: str, idempotent: bool = True, **kwargs
+    ) -> httpx.Response:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._attempts(method, url, idempotent, **kwargs)
+            outcome = str(response.status_code)
+            return response
+        except CircuitOpenError:
+            outcome = "circuit_open"
+            raise
+        finally:
+            metrics.MEDIAMTX_SECONDS.observe(
+                time.perf_counter() - started, op=op, outcome=outcome
+            )
+
+    async def _attempts(self, method: str, url: str, idempotent: bool, **kwargs) -> httpx.Response:
+        self._check_circuit()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                if response.status_code < 500:
+                    self._record(True)
+                    return response
+                error: Exception = httpx.HTTPStatusError(
+                    f"MediaMTX returned {response.status_code}",
+                    request=response.request,
+                    response=response,
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                error = e  # never reached MediaMTX, always safe to retry
+            except httpx.TransportError as e:
+                if not idempotent:
+                    self._record(False)
+                    raise
+                error = e
+            self._record(False)
+            if attempt == self.retries or self.opened_at is not None:
+                raise error
+            await asyncio.sleep(random.uniform(0, 0.2 * 2**attempt))
+        raise AssertionError("unreachable")
+
+    async def list_paths(self) -> List[PathInfo]:
+        paths = []
+        page = 0
+        while True:
+            response = await self._request(
+                "GET", "/v3/paths/list", "paths/list", params={"page": page, "itemsPerPage": 1000}
+            )
+            response.raise_for_status()
+            body = response.json()
+            for item in body["items"]:
+                paths.append(
+                    PathInfo(
+                        name=item["name"],
+                        ready=item["ready"],
+                        bytes_received=item.get("bytesReceived", 0),
+                        tracks=tuple(item.get("tracks") or ()),
+                    )
+                )
+            page += 1
+            if page >= body.get("pageCount", 1):
+                return paths
+
+    async def list_path_configs(self) -> List[str]:
+        names = []
+        page = 0
+        while True:
+            response = await self._request(
+                "GET", "/v3/config/paths/list", "config/paths/list", params={"page": page, "itemsPerPage": 1000}
+            )
+            response.raise_for_status()
+            body = response.json()
+            names.extend(item["name"] for item in body["items"])
+            page += 1
+            if page >= body.get("pageCount", 1):
+                return names
+
+    async def delete_path(self, name: str):
+        response = await self._request(
+            "DELETE", f"/v3/config/paths/delete/{name}", "config/paths/delete"
+        )
+        if response.status_code == 404:
+            return
+        response.raise_for_status()
+
+    async def add_path(self, name: str):
+        response = await self._request(
+            "POST",
+            f"/v3/config/paths/add/{name}",
+            "config/paths/add",
+            idempotent=False,
+            json={"name": name},
+        )
+        # a retried add can land after the first one already succeeded
+        if response.status_code == 400 and "already exists" in response.text:
+            return
+        response.raise_for_status()
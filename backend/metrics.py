@@ -0,0 +1,194 @@
+import asyncio
+import bisect
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# upper bounds in seconds, from a fast SQLite query to a slow upstream timeout
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGISTRY: List["Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metric:
+    """One Prometheus metric family with a fixed set of label names.
+
+    Series are keyed by their label values and created on first use. Updates
+    are plain dict and float operations on the event loop, so instrumenting
+    a call site costs well under a microsecond.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.series: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _format(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self.series.items():
+            yield f"{self.name}{self._format(key)} {value}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self.series[key] = self.series.get(key, 0.0) + amount  # type: ignore
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self.series[self._key(labels)] = value
+
+    def clear(self):
+        self.series.clear()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            # per-bucket counts plus +Inf, then the sum; made cumulative on render
+            series = self.series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1  # type: ignore
+        series[-1] += value  # type: ignore
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, series in self.series.items():
+            *counts, total = series  # type: ignore
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = self._format(key, f'le="{le}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{self._format(key)} {total}"
+            yield f"{self.name}_count{self._format(key)} {cumulative}"
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+async def watch_loop_lag(interval: float = 0.5):
+    # a sleep that wakes late means something held the event loop
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.set(max(0.0, time.perf_counter() - started - interval))
+
+
+HTTP_SECONDS = Histogram(
+    "onboard_http_request_seconds",
+    "Time from receiving a request to starting the response",
+    ["method", "route"],
+)
+MEDIAMTX_SECONDS = Histogram(
+    "onboard_mediamtx_request_seconds",
+    "MediaMTX control API calls, including retries",
+    ["op", "outcome"],
+)
+SLACK_SECONDS = Histogram(
+    "onboard_slack_api_seconds", "Slack Web API calls", ["method", "outcome"]
+)
+DB_SECONDS = Histogram("onboard_db_query_seconds", "Prisma queries", ["model", "method"])
+PROBE_SECONDS = Histogram(
+    "onboard_probe_seconds", "Recording duration probes in the process pool", ["outcome"]
+)
+JOB_SECONDS = Histogram("onboard_job_seconds", "APScheduler job runs", ["job"])
+JOB_ERRORS = Counter("onboard_job_errors_total", "APScheduler job runs that raised", ["job"])
+JOBS_SKIPPED = Counter(
+    "onboard_jobs_skipped_total",
+    "APScheduler runs skipped because the previous run was still going or the run was missed",
+    ["job", "reason"],
+)
+EVENT_LOOP_LAG = Gauge("onboard_event_loop_lag_seconds", "Most recent event loop lag")
+LIVE_STREAMS = Gauge("onboard_live_streams", "Streams currently live")
+STALLED_STREAMS = Gauge(
+    "onboard_stalled_streams", "Live streams whose ingest stalled (leader only)"
+)
+# labelled with the public id from /api/v1/streams, never the stream key
+FOCUSED_STREAM = Gauge("onboard_focused_stream", "1 for the stream in focus", ["stream"])
+REGISTRY_VERSION = Gauge("onboard_registry_version", "Version of the stream registry snapshot")
+EVENT_SUBSCRIBERS = Gauge("onboard_event_subscribers", "Open /api/v1/events streams")
+SLACK_PENDING = Gauge("onboard_slack_outbox_pending", "Unsent outbound Slack calls", ["method"])
+MEDIAMTX_CIRCUIT_OPEN = Gauge("onboard_mediamtx_circuit_open", "1 while the MediaMTX circuit is open")
+IS_LEADER = Gauge("onboard_is_leader", "1 if this worker runs the singleton jobs")
+
+
+class HTTPMetricsMiddleware:
+    """ASGI middleware timing every request up to the start of its response,
+    labelled by route template so path parameters don't explode the series."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        observed = False
+
+        def observe():
+            nonlocal observed
+            if not observed:
+                observed = True
+                route = getattr(scope.get("route"), "path", "unmatched")
+                HTTP_SECONDS.observe(
+                    time.perf_counter() - started, method=scope["method"], route=route
+                )
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                observe()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            observe()
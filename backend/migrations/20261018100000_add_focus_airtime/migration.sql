@@ -0,0 +1,3 @@
+-- AlterTable
+ALTER TABLE "Stream" ADD COLUMN "focus_seconds" INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE "Stream" ADD COLUMN "last_focused" DATETIME;
@@ -0,0 +1,11 @@
+-- AlterTable
+ALTER TABLE "Stream" ADD COLUMN "last_live" DATETIME;
+
+-- CreateTable
+CREATE TABLE "UserStats" (
+    "user_id" TEXT NOT NULL PRIMARY KEY,
+    "sessions" INTEGER NOT NULL DEFAULT 0,
+    "submitted_minutes" INTEGER NOT NULL DEFAULT 0,
+    "approved_minutes" INTEGER NOT NULL DEFAULT 0,
+    CONSTRAINT "UserStats_user_id_fkey" FOREIGN KEY ("user_id") REFERENCES "User" ("id") ON DELETE RESTRICT ON UPDATE CASCADE
+);
@@ -0,0 +1,8 @@
+-- CreateIndex
+CREATE INDEX "PullRequest_user_id_idx" ON "PullRequest"("user_id");
+
+-- CreateIndex
+CREATE INDEX "Session_reviewed_id_idx" ON "Session"("reviewed", "id");
+
+-- CreateIndex
+CREATE INDEX "Session_pr_id_reviewed_id_idx" ON "Session"("pr_id", "reviewed", "id");
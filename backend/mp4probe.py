@@ -0,0 +1,271 @@
+import mmap
+import os
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Tuple
+
+# boxes we descend into; everything else (mdat in particular) is skipped
+# by its header so the media payload is never touched
+CONTAINERS = {b"moov", b"trak", b"mdia", b"mvex", b"moof", b"traf"}
+
+# sample_is_non_sync_sample in the trun/tfhd/trex sample flags
+NON_SYNC = 0x10000
+
+
+@dataclass
+class Track:
+    timescale: int = 0
+    duration: int = 0  # from mdhd, 0 for fragmented files
+    default_sample_duration: int = 0  # from trex
+    start: int | None = None  # earliest tfdt
+    end: int = 0  # latest tfdt + fragment length
+    summed: int = 0  # fallback when fragments carry no tfdt
+    video: bool = False  # hdlr is vide
+    default_sample_flags: int = 0  # from trex
+    keyframes: List[Tuple[int, int]] = field(default_factory=list)  # (decode time, moof offset)
+
+
+@dataclass
+class _Fragment:
+    track_id: int = 0
+    default_sample_duration: int | None = None
+    default_sample_flags: int | None = None
+    base_time: int | None = None
+    length: int = 0
+    sync: List[int] = field(default_factory=list)  # decode offsets of sync samples
+
+
+@dataclass
+class Movie:
+    timescale: int = 0
+    duration: int = 0
+    tracks: Dict[int, Track] = field(default_factory=dict)
+    init_size: int = 0  # ftyp + moov, up to the first moof
+    moof: int = 0  # offset of the moof being parsed
+
+
+@dataclass
+class KeyframeIndex:
+    """Where a fragmented recording can be cut without re-encoding: the size
+    of its init segment, and (seconds, byte offset) of every moof that holds
+    a video sync sample. Bytes [0, init_size) followed by bytes from any of
+    those offsets onward form a playable fMP4."""
+
+    init_size: int
+    frames: List[Tuple[float, int]]
+
+
+def _boxes(buf, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload start, box end) for each box in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            (size,) = struct.unpack_from(">Q", buf, pos + 8)
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return  # truncated, e.g. a segment that is still being written
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _full_box(buf, pos: int) -> Tuple[int, int, int]:
+    (word,) = struct.unpack_from(">I", buf, pos)
+    return word >> 24, word & 0xFFFFFF, pos + 4
+
+
+def _parse_time_header(buf, pos: int) -> Tuple[int, int]:
+    # mvhd and mdhd share their layout up to the duration field
+    version, _, pos = _full_box(buf, pos)
+    if version == 1:
+        return struct.unpack_from(">IQ", buf, pos + 16)
+    return struct.unpack_from(">II", buf, pos + 8)
+
+
+def _track_id(buf, pos: int) -> int:
+    version, _, pos = _full_box(buf, pos)
+    return struct.unpack_from(">I", buf, pos + (16 if version == 1 else 8))[0]
+
+
+def _parse_trak(buf, start: int, end: int, movie: Movie):
+    track_id = 0
+    track = Track()
+    for kind, pos, box_end in _boxes(buf, start, end):
+        if kind == b"tkhd":
+            track_id = _track_id(buf, pos)
+        elif kind == b"mdia":
+            for sub, sub_pos, _ in _boxes(buf, pos, box_end):
+                if sub == b"mdhd":
+                    track.timescale, track.duration = _parse_time_header(buf, sub_pos)
+                elif sub == b"hdlr":
+                    track.video = buf[sub_pos + 8 : sub_pos + 12] == b"vide"
+    existing = movie.tracks.get(track_id)
+    if existing is not None:
+        track.default_sample_duration = existing.default_sample_duration
+        track.default_sample_flags = existing.default_sample_flags
+    movie.tracks[track_id] = track
+
+
+def _parse_trun(
+    buf, pos: int, default_duration: int, default_flags: int, sync: List[int] | None = None
+) -> int:
+    """Length of the run in timescale units. When sync is given, the decode
+    offset of each sync sample within the run is appended to it."""
+    _, flags, pos = _full_box(buf, pos)
+    (count,) = struct.unpack_from(">I", buf, pos)
+    pos += 4
+    if flags & 0x1:
+        pos += 4  # data_offset
+    first_flags = default_flags
+    if flags & 0x4:
+        (first_flags,) = struct.unpack_from(">I", buf, pos)
+        pos += 4
+    has_duration = flags & 0x100
+    has_flags = flags & 0x400
+    if sync is None or not (has_flags or flags & 0x4 or not default_flags & NON_SYNC):
+        sync = None  # no sync samples to find, so no need to walk the samples
+        if not has_duration:
+            return count * default_duration
+    stride = 4 * bin(flags & 0xF00).count("1")
+    flags_at = 4 if has_duration else 0
+    if flags & 0x200:
+        flags_at += 4
+    length = 0
+    for i in range(count):
+        sample = pos + i * stride
+        if sync is not None:
+            if has_flags:
+                (sample_flags,) = struct.unpack_from(">I", buf, sample + flags_at)
+            else:
+                sample_flags = first_flags if i == 0 else default_flags
+            if not sample_flags & NON_SYNC:
+                sync.append(length)
+        length += struct.unpack_from(">I", buf, sample)[0] if has_duration else default_duration
+    return length
+
+
+def _parse_traf(buf, start: int, end: int, movie: Movie):
+    frag = _Fragment()
+    for kind, pos, _ in _boxes(buf, start, end):
+        if kind == b"tfhd":
+            _, flags, pos = _full_box(buf, pos)
+            (frag.track_id,) = struct.unpack_from(">I", buf, pos)
+            pos += 4
+            if flags & 0x1:
+                pos += 8
+            if flags & 0x2:
+                pos += 4
+            if flags & 0x8:
+                (frag.default_sample_duration,) = struct.unpack_from(">I", buf, pos)
+                pos += 4
+            if flags & 0x10:
+                pos += 4
+            if flags & 0x20:
+                (frag.default_sample_flags,) = struct.unpack_from(">I", buf, pos)
+        elif kind == b"tfdt":
+            version, _, pos = _full_box(buf, pos)
+            (frag.base_time,) = struct.unpack_from(
+                ">Q" if version == 1 else ">I", buf, pos
+            )
+        elif kind == b"trun":
+            track = movie.tracks.setdefault(frag.track_id, Track())
+            default = frag.default_sample_duration
+            if default is None:
+                default = track.default_sample_duration
+            default_flags = frag.default_sample_flags
+            if default_flags is None:
+                default_flags = track.default_sample_flags
+            offsets = [] if track.video else None
+            length = _parse_trun(buf, pos, default, default_flags, offsets)
+            frag.sync += [frag.length + offset for offset in offsets or ()]
+            frag.length += length
+    track = movie.tracks.setdefault(frag.track_id, Track())
+    if frag.sync:
+        # one cut point per fragment: the moof is the unit we can splice at
+        base = track.summed if frag.base_time is None else frag.base_time
+        track.keyframes.append((base + frag.sync[0], movie.moof))
+    if frag.base_time is None:
+        track.summed += frag.length
+        return
+    if track.start is None or frag.base_time < track.start:
+        track.start = frag.base_time
+    track.end = max(track.end, frag.base_time + frag.length)
+
+
+def _walk(buf, start: int, end: int, movie: Movie):
+    box_start = start
+    for kind, pos, box_end in _boxes(buf, start, end):
+        if kind == b"moof":
+            movie.moof = box_start
+            if not movie.init_size:
+                movie.init_size = box_start
+        box_start = box_end
+        if kind == b"mvhd":
+            movie.timescale, movie.duration = _parse_time_header(buf, pos)
+        elif kind == b"trak":
+            _parse_trak(buf, pos, box_end, movie)
+        elif kind == b"trex":
+            _, _, trex_pos = _full_box(buf, pos)
+            track_id, _, default_duration, _, default_flags = struct.unpack_from(
+                ">IIIII", buf, trex_pos
+            )
+            track = movie.tracks.setdefault(track_id, Track())
+            track.default_sample_duration = default_duration
+            track.default_sample_flags = default_flags
+        elif kind == b"traf":
+            _parse_traf(buf, pos, box_end, movie)
+        elif kind in CONTAINERS:
+            _walk(buf, pos, box_end, movie)
+
+
+def parse(path: str) -> Movie:
+    movie = Movie()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return movie
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            try:
+                _walk(buf, 0, size, movie)
+            except struct.error:
+                pass  # a box ran past the end of the file; keep what we have
+    return movie
+
+
+def duration(path: str) -> float:
+    """Duration of an MP4/fMP4 file in seconds, read from box headers only."""
+    return movie_duration(parse(path))
+
+
+def movie_duration(movie: Movie) -> float:
+    longest = 0.0
+    for track in movie.tracks.values():
+        if not track.timescale:
+            continue
+        ticks = track.summed
+        if track.start is not None:
+            ticks += track.end - track.start
+        longest = max(longest, (ticks or track.duration) / track.timescale)
+    if longest == 0.0 and movie.timescale:
+        longest = movie.duration / movie.timescale
+    return longest
+
+
+def keyframe_index(movie: Movie) -> KeyframeIndex | None:
+    """None unless the file is fragmented and has a video track with sync samples."""
+    for track in movie.tracks.values():
+        if track.video and track.timescale and track.keyframes and movie.init_size:
+            start = track.start or 0
+            return KeyframeIndex(
+                movie.init_size,
+                [
+                    (round((ticks - start) / track.timescale, 3), offset)
+                    for ticks, offset in track.keyframes
+                ],
+            )
+    return None
@@ -0,0 +1,77 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict
+
+import metrics
+from catalog import RecordingCatalog, probe
+
+
+class ProbeService:
+    """Async front for recording durations in the catalog.
+
+    Catalog reads and writes go to a small thread pool and probes of files
+    with no known duration go to a bounded process pool, so the event loop
+    only awaits futures. Concurrent requests for the same path share a single probe.
+    """
+
+    def __init__(self, catalog: RecordingCatalog, workers: int = 2, timeout: float = 10.0):
+        self.catalog = catalog
+        self.workers = workers
+        self.timeout = timeout
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.probe_pool: ProcessPoolExecutor | None = None
+        self.io_pool: ThreadPoolExecutor | None = None
+
+    def start(self):
+        self.probe_pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="catalog")
+
+    def shutdown(self):
+        for task in self.in_flight.values():
+            task.cancel()
+        if self.probe_pool is not None:
+            self.probe_pool.shutdown(wait=False, cancel_futures=True)
+        if self.io_pool is not None:
+            self.io_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _io(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.io_pool, func, *args)
+
+    async def _probe(self, path: str) -> float:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            size, mtime_ns, seconds, keyframes = await asyncio.get_running_loop().run_in_executor(
+                self.probe_pool, probe, path
+            )
+            outcome = "ok"
+        except FileNotFoundError:
+            outcome = "missing"
+            await self._io(self.catalog.forget, path)
+            return 0.0
+        finally:
+            metrics.PROBE_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+        await self._io(self.catalog.store, path, size, mtime_ns, seconds, keyframes)
+        return seconds
+
+    async def refresh(self, path: str, timeout: float | None = None) -> float:
+        task = self.in_flight.get(path)
+        if task is None:
+            task = asyncio.create_task(self._probe(path))
+            self.in_flight[path] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(path, None))
+        # shield so one caller timing out doesn't cancel the probe for the others
+        return await asyncio.wait_for(asyncio.shield(task), timeout or self.timeout)
+
+    async def duration(self, path: str, timeout: float | None = None) -> float:
+        seconds = await self._io(self.catalog.get, path)
+        if seconds is not None:
+            return seconds
+        if not await self._io(os.path.exists, path):
+            return 0.0
+        return await self.refresh(path, timeout)
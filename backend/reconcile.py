@@ -0,0 +1,68 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, List, Set
+
+from mediamtx import MediaMTXClient
+
+# configured paths that don't belong to a stream and must never be removed
+PROTECTED_PATHS = {"all", "all_others"}
+
+
+@dataclass
+class ReconcileResult:
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+async def reconcile_paths(
+    mediamtx: MediaMTXClient,
+    stream_keys: Iterable[str],
+    concurrency: int = 8,
+    remove: bool = True,
+    existing: Callable[[Set[str]], Awaitable[Set[str]]] | None = None,
+) -> ReconcileResult:
+    """Make MediaMTX's path config match the Stream table.
+
+    Fetches the current config once and only adds missing keys (and removes
+    stale ones), at most `concurrency` requests at a time. stream_keys may
+    be older than the config, so `existing` is asked which of the paths
+    about to be removed belong to a stream by now, and those are kept.
+    """
+    started = time.monotonic()
+    result = ReconcileResult()
+    wanted = set(stream_keys)
+    configured = set(await mediamtx.list_path_configs())
+    to_add = wanted - configured
+    to_remove = set()
+    if remove:
+        to_remove = {
+            name
+            for name in configured - wanted
+            if name not in PROTECTED_PATHS and not name.startswith("~")
+        }
+        if to_remove and existing is not None:
+            to_remove -= await existing(to_remove)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def apply(name: str, add: bool):
+        async with semaphore:
+            try:
+                if add:
+                    await mediamtx.add_path(name)
+                    result.added.append(name)
+                else:
+                    await mediamtx.delete_path(name)
+                    result.removed.append(name)
+            except Exception as e:
+                print(f"failed to {'add' if add else 'remove'} MediaMTX path {name}: {e!r}")
+                result.failed.append(name)
+
+    await asyncio.gather(
+        *[apply(name, True) for name in to_add],
+        *[apply(name, False) for name in to_remove],
+    )
+    result.seconds = time.monotonic() - started
+    return result
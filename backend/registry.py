@@ -0,0 +1,118 @@
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, FrozenSet, List, Tuple
+
+
+@dataclass(frozen=True)
+class StreamEntry:
+    name: str
+    live_since: datetime
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    streams: Tuple[StreamEntry, ...]
+    focused: str | None
+    names: FrozenSet[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # membership is checked per leaderboard row, so keep it O(1)
+        object.__setattr__(self, "names", frozenset(stream.name for stream in self.streams))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "version": self.version,
+                "focused": self.focused,
+                "streams": [
+                    {"name": stream.name, "live_since": stream.live_since.isoformat()}
+                    for stream in self.streams
+                ],
+            }
+        )
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Snapshot":
+        data = json.loads(raw)
+        return cls(
+            data["version"],
+            tuple(
+                StreamEntry(stream["name"], datetime.fromisoformat(stream["live_since"]))
+                for stream in data["streams"]
+            ),
+            data["focused"],
+        )
+
+
+class StreamRegistry:
+    """Live streams keyed by stream key, kept in the order they went live.
+
+    Lookups, adds and removes are O(1). Readers should take snapshot(), which
+    is immutable and only rebuilt after the registry has changed.
+    """
+
+    def __init__(self):
+        self._streams: Dict[str, StreamEntry] = {}
+        self._focused: str | None = None
+        self._version = 0
+        self._snapshot = Snapshot(0, (), None)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._streams
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def get(self, name: str) -> StreamEntry | None:
+        return self._streams.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._streams)
+
+    @property
+    def focused(self) -> str | None:
+        return self._focused
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def add(self, name: str) -> bool:
+        if name in self._streams:
+            return False
+        self._streams[name] = StreamEntry(name, datetime.now(timezone.utc))
+        self._version += 1
+        return True
+
+    def remove(self, name: str) -> bool:
+        if self._streams.pop(name, None) is None:
+            return False
+        if self._focused == name:
+            self._focused = None
+        self._version += 1
+        return True
+
+    def set_focus(self, name: str | None):
+        if name is not None and name not in self._streams:
+            raise KeyError(name)
+        if name != self._focused:
+            self._focused = name
+            self._version += 1
+
+    def restore(self, snapshot: Snapshot):
+        # take over state published by a previous leader
+        self._streams = {stream.name: stream for stream in snapshot.streams}
+        self._focused = snapshot.focused if snapshot.focused in self._streams else None
+        self._version = snapshot.version + 1
+
+    def snapshot(self) -> Snapshot:
+        if self._snapshot.version != self._version:
+            self._snapshot = Snapshot(
+                self._version, tuple(self._streams.values()), self._focused
+            )
+        return self._snapshot
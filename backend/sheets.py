@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from catalog import RecordingCatalog
+from mp4probe import KeyframeIndex
+from probe_pool import ProbeService
+
+SHEET_ROOT = "./db/sheets"
+COLUMNS = 6
+ROWS = 4
+TILE_WIDTH = 320
+# bump when the rendering changes so old sheets are not served
+VERSION = 1
+
+
+def sheet_key(path: str, size: int, mtime_ns: int) -> str:
+    """Cache key for one recording's sheet: changes whenever the file does."""
+    identity = f"{VERSION}:{COLUMNS}x{ROWS}:{TILE_WIDTH}:{path}:{size}:{mtime_ns}"
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+def sample_ranges(index: KeyframeIndex, seconds: float, size: int) -> List[Tuple[int, int]]:
+    """Byte ranges of the init segment plus one GOP for each sample point,
+    spread evenly across the recording."""
+    tiles = COLUMNS * ROWS
+    times = [keyframe for keyframe, _ in index.frames]
+    # the last keyframe at or before each sample point
+    chosen = {
+        max(bisect_right(times, seconds * (i + 0.5) / tiles) - 1, 0) for i in range(tiles)
+    }
+    ranges = [(0, index.init_size)]
+    for n in sorted(chosen):
+        end = index.frames[n + 1][1] if n + 1 < len(index.frames) else size
+        ranges.append((index.frames[n][1], end))
+    return ranges
+
+
+def render(
+    path: str, seconds: float, index: KeyframeIndex | None, size: int, output: str
+):
+    """Runs in the sheet pool: decode keyframes spread across the recording,
+    scale them down and tile them into one JPEG at output."""
+    spacing = max(seconds / (COLUMNS * ROWS), 0.5)
+    # every keyframe is decoded, so spread them out unless already sampled
+    filters = f"select='isnan(prev_selected_t)+gte(t-prev_selected_t\\,{spacing:.3f})',"
+    with tempfile.TemporaryDirectory(prefix="sheet-") as directory:
+        source = path
+        if index is not None and index.frames:
+            # only read the GOPs we sample instead of the whole recording
+            source = os.path.join(directory, "samples.mp4")
+            with open(path, "rb") as src, open(source, "wb") as dst:
+                for start, end in sample_ranges(index, seconds, size):
+                    src.seek(start)
+                    dst.write(src.read(end - start))
+            filters = ""
+        partial = os.path.join(directory, "sheet.jpg")
+        subprocess.run(
+            [
+                "ffmpeg", "-hide_banner", "-nostats", "-loglevel", "error",
+                "-skip_frame", "nokey", "-i", source, "-an", "-sn", "-dn",
+                "-vf", f"{filters}scale={TILE_WIDTH}:-2,tile={COLUMNS}x{ROWS}:padding=4:margin=4",
+                "-frames:v", "1", "-q:v", "4", "-y", partial,
+            ],  # fmt: skip
+            check=True,
+            timeout=120,
+        )
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        os.replace(partial, output)
+
+
+def evict(root: str, max_bytes: int):
+    """Delete the least recently used sheets until root fits in max_bytes."""
+    entries = []
+    total = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+class ContactSheets:
+    """Tiled thumbnails of recordings for reviewers, rendered in a process
+    pool into a cache under root that is keyed by the recording's identity
+    and trimmed back to max_bytes (least recently served first)."""
+
+    def __init__(
+        self,
+        catalog: RecordingCatalog,
+        probe_service: ProbeService,
+        root: str = SHEET_ROOT,
+        max_bytes: int = 512 * 1024 * 1024,
+        workers: int = 1,
+        max_prefetch: int = 64,
+    ):
+        self.catalog = catalog
+        self.probe_service = probe_service
+        self.root = root
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.max_prefetch = max_prefetch
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.prefetching: Dict[str, asyncio.Task] = {}  # recording -> task
+        self.pool: ProcessPoolExecutor | None = None
+        self.rendered = 0
+        self.failed = 0
+
+    def start(self):
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def shutdown(self):
+        for task in [*self.in_flight.values(), *self.prefetching.values()]:
+            task.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.jpg")
+
+    async def _render(self, recording: str, output: str):
+        started = time.perf_counter()
+        seconds = await self.probe_service.duration(recording)
+        index = await asyncio.to_thread(self.catalog.keyframes, recording)
+        size = (await asyncio.to_thread(os.stat, recording)).st_size
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self.pool, render, recording, seconds, index, size, output
+            )
+        except Exception as e:
+            self.failed += 1
+            print(f"contact sheet for {recording} failed: {e!r}")
+            raise
+        self.rendered += 1
+        print(f"contact sheet for {recording} in {time.perf_counter() - started:.1f}s")
+        await asyncio.to_thread(evict, self.root, self.max_bytes)
+
+    async def get(self, recording: str) -> Tuple[str, str] | None:
+        """(sheet path, cache key) for a recording, rendering it if needed.
+        None if the recording is gone."""
+        try:
+            st = await asyncio.to_thread(os.stat, recording)
+        except FileNotFoundError:
+            return None
+        key = sheet_key(recording, st.st_size, st.st_mtime_ns)
+        output = self._path(key)
+        try:
+            # served counts as used, for eviction
+            await asyncio.to_thread(os.utime, output)
+            return output, key
+        except FileNotFoundError:
+            pass
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render(recording, output))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        await asyncio.shield(task)
+        return output, key
+
+    def schedule(self, recording: str):
+        """Render in the background, e.g. as soon as a session is submitted.
+        Skipped once max_prefetch renders are waiting; those sheets are
+        rendered when they're first asked for instead."""
+        if recording in self.prefetching or len(self.prefetching) >= self.max_prefetch:
+            return
+
+        async def prefetch():
+            try:
+                await self.get(recording)
+            except Exception:
+                pass  # already logged; the endpoint will retry on demand
+
+        task = asyncio.create_task(prefetch())
+        self.prefetching[recording] = task
+        task.add_done_callback(lambda _: self.prefetching.pop(recording, None))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "in_flight": len(self.in_flight),
+            "prefetching": len(self.prefetching),
+        }
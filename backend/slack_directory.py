@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+
+import httpx
+from slack_sdk.web.async_client import AsyncWebClient
+
+V = TypeVar("V")
+
+VERIFY_URL = "https://verify.hackclub.dev/api/status"
+
+
+class TTLCache(Generic[V]):
+    """LRU map whose entries also expire ttl seconds after they were loaded.
+
+    get() loads missing keys through the given coroutine function. Concurrent
+    gets for the same key share one load (single flight), and a failed load
+    is never cached. ttl_for can pick a different ttl for a loaded value.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_size: int = 4096,
+        ttl_for: Callable[[V], float | None] | None = None,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.ttl_for = ttl_for
+        self.entries: OrderedDict[Hashable, Tuple[float, V]] = OrderedDict()
+        self.in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, key: Hashable) -> V | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, value: V, ttl: float | None = None):
+        self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self.entries.pop(key, None)
+
+    async def get(self, key: Hashable, load: Callable[[], Awaitable[V]]) -> V:
+        value = self.peek(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, load))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        # shield so one cancelled caller doesn't fail the load for the rest
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, load: Callable[[], Awaitable[V]]) -> V:
+        value = await load()
+        self.put(key, value, self.ttl_for(value) if self.ttl_for else None)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+
+class SlackDirectory:
+    """Cached per-user lookups for the application and approval handlers:
+    DM channel ID, real name, and Hack Club verification status."""
+
+    def __init__(
+        self,
+        client: AsyncWebClient,
+        profile_ttl: float = 3600.0,
+        eligible_ttl: float = 3600.0,
+        ineligible_ttl: float = 60.0,
+    ):
+        self.client = client
+        # a user's IM channel with the bot never changes
+        self.channels: TTLCache[str] = TTLCache(ttl=7 * 86400)
+        self.names: TTLCache[str] = TTLCache(ttl=profile_ttl)
+        # recheck the ineligible soon, they've been asked to fill out the
+        # verification form
+        self.eligibility: TTLCache[bool] = TTLCache(
+            ttl=eligible_ttl,
+            ttl_for=lambda eligible: None if eligible else ineligible_ttl,
+        )
+        self.http: httpx.AsyncClient
+
+    async def start(self):
+        self.http = httpx.AsyncClient(timeout=httpx.Timeout(10.0))
+
+    async def close(self):
+        await self.http.aclose()
+
+    async def dm_channel(self, user: str) -> str:
+        async def load():
+            response = await self.client.conversations_open(users=user, return_im=True)
+            return response["channel"]["id"]
+
+        return await self.channels.get(user, load)
+
+    async def real_name(self, user: str) -> str:
+        async def load():
+            return (await self.client.users_info(user=user))["user"]["real_name"]
+
+        return await self.names.get(user, load)
+
+    async def is_eligible(self, user: str) -> bool:
+        async def load():
+            response = await self.http.request(
+                "GET", VERIFY_URL, content=json.dumps({"slack_id": user})
+            )
+            return "Eligible L" not in response.text
+
+        return await self.eligibility.get(user, load)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "channels": self.channels.stats(),
+            "names": self.names.stats(),
+            "eligibility": self.eligibility.stats(),
+        }
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict
+
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+from slack_sdk.web.async_slack_response import AsyncSlackResponse
+
+import metrics
+
+# Sustained calls per second and burst size, a little under Slack's tier limits
+# (chat.postMessage: ~1/s per channel, Tier 3: 50/min, Tier 4: 100/min).
+RATES: Dict[str, tuple[float, int]] = {
+    "chat.postMessage": (1.0, 5),
+    "chat.postEphemeral": (1.5, 10),
+    "chat.delete": (0.8, 5),
+}
+DEFAULT_RATE = (0.8, 5)
+
+
+class TimedWebClient(AsyncWebClient):
+    # every Web API method goes through api_call
+    async def api_call(self, api_method: str, **kwargs) -> AsyncSlackResponse:  # type: ignore[override]
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await super().api_call(api_method, **kwargs)
+        except SlackApiError as e:
+            outcome = str(e.response.get("error") or e.response.status_code)
+            raise
+        except Exception:
+            outcome = "exception"
+            raise
+        finally:
+            metrics.SLACK_SECONDS.observe(
+                time.perf_counter() - started, method=api_method, outcome=outcome
+            )
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.updated = self.blocked_until
+        self.tokens = 1.0  # one retry as soon as the block lifts
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class Outbound:
+    method: str
+    kwargs: Dict[str, Any]
+    coalesce_key: str | None = None
+    attempts: int = 0
+
+
+@dataclass
+class Lane:
+    bucket: TokenBucket
+    pending: Deque[Outbound] = field(default_factory=deque)
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+    worker: asyncio.Task | None = None
+    sending: bool = False
+
+
+class SlackOutbox:
+    """Fire-and-forget queue for outbound Slack Web API calls.
+
+    Each API method gets its own lane, token bucket and worker, so a
+    rate-limited method never holds up the others. A 429 pauses the lane for
+    Retry-After seconds and the call is retried. Messages enqueued with a
+    coalesce_key replace any still-unsent message with the same key.
+    """
+
+    def __init__(self, client: AsyncWebClient, max_attempts: int = 5):
+        self.client = client
+        self.max_attempts = max_attempts
+        self.lanes: Dict[str, Lane] = {}
+        self.coalescing: Dict[str, Outbound] = {}
+        self.running = False
+
+    def start(self):
+        self.running = True
+        for lane in self.lanes.values():
+            self._spawn(lane)
+
+    async def stop(self, timeout: float = 5.0):
+        # let what's queued go out, e.g. replies to the last few actions
+        deadline = time.monotonic() + timeout
+        while self.running and time.monotonic() < deadline and any(
+            lane.pending or lane.sending for lane in self.lanes.values()
+        ):
+            await asyncio.sleep(0.05)
+        dropped = sum(len(lane.pending) for lane in self.lanes.values())
+        if dropped:
+            print(f"dropping {dropped} queued Slack calls on shutdown")
+        self.running = False
+        workers = [lane.worker for lane in self.lanes.values() if lane.worker]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    def _spawn(self, lane: Lane):
+        if lane.worker is None or lane.worker.done():
+            lane.worker = asyncio.create_task(self._run(lane))
+
+    def _lane(self, method: str) -> Lane:
+        lane = self.lanes.get(method)
+        if lane is None:
+            lane = Lane(TokenBucket(*RATES.get(method, DEFAULT_RATE)))
+            self.lanes[method] = lane
+            if self.running:
+                self._spawn(lane)
+        return lane
+
+    def enqueue(self, method: str, coalesce_key: str | None = None, **kwargs):
+        if coalesce_key is not None:
+            queued = self.coalescing.get(coalesce_key)
+            if queued is not None:
+                queued.kwargs = kwargs  # keep its place in line, send the newer text
+                return
+        message = Outbound(method, kwargs, coalesce_key)
+        if coalesce_key is not None:
+            self.coalescing[coalesce_key] = message
+        lane = self._lane(method)
+        lane.pending.append(message)
+        lane.wakeup.set()
+
+    def post_message(self, coalesce_key: str | None = None, **kwargs):
+        self.enqueue("chat.postMessage", coalesce_key, **kwargs)
+
+    async def _send(self, lane: Lane, message: Outbound):
+        await lane.bucket.acquire()
+        if message.coalesce_key is not None:
+            self.coalescing.pop(message.coalesce_key, None)
+        try:
+            await self.client.api_call(message.method, json=message.kwargs)
+        except SlackApiError as e:
+            message.attempts += 1
+            if e.response.status_code != 429 or message.attempts >= self.max_attempts:
+                print(f"dropping {message.method} after error: {e.response.get('error')}")
+                return
+            lane.bucket.block(float(e.response.headers.get("Retry-After", 1)))
+            if message.coalesce_key is not None:
+                self.coalescing.setdefault(message.coalesce_key, message)
+            lane.pending.appendleft(message)
+        except Exception as e:
+            print(f"dropping {message.method} after error: {e!r}")
+
+    async def _run(self, lane: Lane):
+        while True:
+            if not lane.pending:
+                lane.wakeup.clear()
+                await lane.wakeup.wait()
+                continue
+            lane.sending = True
+            try:
+                await self._send(lane, lane.pending.popleft())
+            finally:
+                lane.sending = False
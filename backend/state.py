@@ -0,0 +1,295 @@
+import asyncio
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from threading import Lock
+from typing import Awaitable, Callable, List
+from urllib.parse import urlparse
+
+
+class StateStore(ABC):
+    """State shared by every backend worker process.
+
+    Values are strings. Leases give leader election: only the owner of a
+    lease can renew it, and it lapses ttl seconds after the last renewal.
+    Queues are FIFO lists used to hand work to the leader.
+    """
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    async def get(self, key: str) -> str | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float | None = None):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        ...
+
+    @abstractmethod
+    async def release_lease(self, name: str, owner: str):
+        ...
+
+    @abstractmethod
+    async def push(self, queue: str, value: str):
+        ...
+
+    @abstractmethod
+    async def pop_all(self, queue: str) -> List[str]:
+        ...
+
+
+class SQLiteStateStore(StateStore):
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = Lock()
+        self.conn: sqlite3.Connection
+
+    async def connect(self):
+        self.conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None, timeout=5
+        )
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, value TEXT NOT NULL)"
+        )
+
+    async def close(self):
+        self.conn.close()
+
+    def _run(self, func, *args):
+        def locked():
+            with self.lock:
+                return func(*args)
+
+        return asyncio.to_thread(locked)
+
+    def _get(self, key):
+        row = self.conn.execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    async def get(self, key: str) -> str | None:
+        return await self._run(self._get, key)
+
+    def _set(self, key, value, ttl):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl if ttl else None),
+        )
+
+    async def set(self, key: str, value: str, ttl: float | None = None):
+        await self._run(self._set, key, value, ttl)
+
+    async def delete(self, key: str):
+        await self._run(self.conn.execute, "DELETE FROM kv WHERE key = ?", (key,))
+
+    def _acquire(self, name, owner, ttl):
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT value, expires FROM kv WHERE key = ?", (name,)
+            ).fetchone()
+            if row is not None and row[0] != owner and (row[1] is None or row[1] > now):
+                return False
+            self._set(name, owner, ttl)
+            return True
+        finally:
+            self.conn.execute("COMMIT")
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        return await self._run(self._acquire, name, owner, ttl)
+
+    async def release_lease(self, name: str, owner: str):
+        await self._run(
+            self.conn.execute, "DELETE FROM kv WHERE key = ? AND value = ?", (name, owner)
+        )
+
+    async def push(self, queue: str, value: str):
+        await self._run(
+            self.conn.execute, "INSERT INTO queue (name, value) VALUES (?, ?)", (queue, value)
+        )
+
+    def _pop_all(self, queue):
+        rows = self.conn.execute(
+            "DELETE FROM queue WHERE name = ? RETURNING id, value", (queue,)
+        ).fetchall()
+        return [value for _, value in sorted(rows)]
+
+    async def pop_all(self, queue: str) -> List[str]:
+        return await self._run(self._pop_all, queue)
+
+
+class RedisStateStore(StateStore):
+    """Speaks plain RESP, so it works against Redis, Valkey, KeyDB or a local
+    stand-in without a client library."""
+
+    def __init__(self, host: str, port: int = 6379, db: int = 0, password: str | None = None):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.lock = asyncio.Lock()
+        self.reader: asyncio.StreamReader
+        self.writer: asyncio.StreamWriter
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self.command("AUTH", self.password)
+        if self.db:
+            await self.command("SELECT", str(self.db))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def _read(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("state store closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            if int(rest) == -1:
+                return None
+            data = await self.reader.readexactly(int(rest) + 2)
+            return data[:-2].decode()
+        if kind == b"*":
+            if int(rest) == -1:
+                return None
+            return [await self._read() for _ in range(int(rest))]
+        raise RuntimeError(f"unexpected RESP reply {line!r}")
+
+    async def command(self, *args: str):
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            encoded = arg.encode()
+            payload.append(b"$%d\r\n%s\r\n" % (len(encoded), encoded))
+        async with self.lock:
+            self.writer.write(b"".join(payload))
+            await self.writer.drain()
+            return await self._read()
+
+    async def get(self, key: str) -> str | None:
+        return await self.command("GET", key)
+
+    async def set(self, key: str, value: str, ttl: float | None = None):
+        if ttl:
+            await self.command("SET", key, value, "PX", str(int(ttl * 1000)))
+        else:
+            await self.command("SET", key, value)
+
+    async def delete(self, key: str):
+        await self.command("DEL", key)
+
+    async def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        ms = str(int(ttl * 1000))
+        if await self.command("SET", name, owner, "NX", "PX", ms) == "OK":
+            return True
+        if await self.command("GET", name) != owner:
+            return False
+        # renewal; GET+SET isn't atomic, but the lease is renewed every ttl/3,
+        # so it would have to be two renewals late for another worker to sneak in
+        return await self.command("SET", name, owner, "XX", "PX", ms) == "OK"
+
+    async def release_lease(self, name: str, owner: str):
+        if await self.command("GET", name) == owner:
+            await self.command("DEL", name)
+
+    async def push(self, queue: str, value: str):
+        await self.command("RPUSH", queue, value)
+
+    async def pop_all(self, queue: str) -> List[str]:
+        values = []
+        while True:
+            value = await self.command("LPOP", queue)
+            if value is None:
+                return values
+            values.append(value)
+
+
+def open_store(url: str) -> StateStore:
+    """sqlite:///./db/state.db or redis://[:password@]host[:port][/db]"""
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        return SQLiteStateStore(url[len("sqlite://") :])
+    if parsed.scheme == "redis":
+        return RedisStateStore(
+            parsed.hostname or "localhost",
+            parsed.port or 6379,
+            int(parsed.path.lstrip("/") or 0),
+            parsed.password,
+        )
+    raise ValueError(f"unsupported state store URL {url}")
+
+
+class LeaderElection:
+    """Keeps trying to hold a lease; whoever holds it runs the singleton jobs."""
+
+    def __init__(
+        self,
+        store: StateStore,
+        name: str = "leader",
+        ttl: float = 15.0,
+        on_elected: Callable[[], Awaitable] | None = None,
+    ):
+        self.store = store
+        self.name = name
+        self.ttl = ttl
+        self.on_elected = on_elected
+        self.owner = f"{os.uname().nodename}:{os.getpid()}"
+        self.is_leader = False
+        self.task: asyncio.Task | None = None
+
+    async def campaign(self) -> bool:
+        was_leader = self.is_leader
+        try:
+            self.is_leader = await self.store.acquire_lease(self.name, self.owner, self.ttl)
+        except Exception as e:
+            print(f"leader election failed: {e!r}")
+            self.is_leader = False
+        if self.is_leader != was_leader:
+            print(f"worker {self.owner} is {'now' if self.is_leader else 'no longer'} the leader")
+            if self.is_leader and self.on_elected is not None:
+                await self.on_elected()
+        return self.is_leader
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            await self.campaign()
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+        if self.is_leader:
+            await self.store.release_lease(self.name, self.owner)
+            self.is_leader = False
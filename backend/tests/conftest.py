@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the backend is a flat set of modules run from its own directory, and the
+# synthetic fMP4 writer lives with the benchmarks
+BACKEND = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, "benchmarks"))
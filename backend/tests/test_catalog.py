@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+import catalog
+from catalog import RecordingCatalog
+
+
+@pytest.fixture
+def recordings(tmp_path, monkeypatch):
+    root = tmp_path / "recordings"
+    monkeypatch.setattr(catalog, "RECORDINGS_ROOT", str(root))
+    return root
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = RecordingCatalog(str(tmp_path / "recordings.db"))
+    db.connect()
+    yield db
+    db.disconnect()
+
+
+def segment(recordings, stream_key: str, minute: int, size: int = 10) -> str:
+    path = recordings / stream_key / f"2024-08-01_12-{minute:02d}-00-000000.mp4"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(bytes(size))
+    return str(path)
+
+
+def probed(db, path: str, seconds: float):
+    st = os.stat(path)
+    db.store(path, st.st_size, st.st_mtime_ns, seconds)
+
+
+def totals_from_scan(db):
+    return {
+        row[0]: (row[1], row[2])
+        for row in db.conn.execute(
+            "SELECT stream_key, COUNT(*), COALESCE(SUM(seconds), 0) FROM recordings GROUP BY stream_key"
+        )
+    }
+
+
+def test_totals_follow_inserts_probes_and_deletes(recordings, db):
+    a1 = segment(recordings, "a", 0)
+    a2 = segment(recordings, "a", 1)
+    db.touch(a1)
+    db.touch(a2)
+    assert db.totals("a") == (2, 0.0)
+    probed(db, a1, 60.0)
+    probed(db, a2, 30.0)
+    assert db.totals("a") == (2, 90.0)
+    # probing again replaces the old duration rather than adding to it
+    probed(db, a2, 45.0)
+    assert db.totals("a") == (2, 105.0)
+    db.forget(a1)
+    assert db.totals("a") == (1, 45.0)
+    assert db.totals("missing") == (0, 0.0)
+
+
+def test_a_changed_file_drops_its_duration(recordings, db):
+    path = segment(recordings, "a", 0)
+    probed(db, path, 60.0)
+    segment(recordings, "a", 0, size=20)  # still being written
+    db.touch(path)
+    assert db.totals("a") == (1, 0.0)
+    assert db.unprobed("a") == [path]
+
+
+def test_sync_keeps_totals_consistent(recordings, db):
+    paths = [segment(recordings, key, minute) for key in ("a", "b") for minute in range(3)]
+    db.sync(paths)
+    for path in paths[:4]:
+        probed(db, path, 10.0)
+    os.remove(paths[0])
+    db.sync(paths[1:])
+    assert db.totals("a") == (2, 20.0)
+    assert db.totals("b") == (3, 10.0)
+    assert {key: db.totals(key) for key in ("a", "b")} == totals_from_scan(db)
+
+
+def test_ranking_by_probed_seconds(recordings, db):
+    for key, seconds in (("a", 30.0), ("b", 90.0), ("c", 60.0)):
+        probed(db, segment(recordings, key, 0), seconds)
+    db.forget(str(recordings / "c" / "2024-08-01_12-00-00-000000.mp4"))
+    count, rows = db.ranking(10)
+    assert count == 2
+    assert [row[0] for row in rows] == ["b", "a"]
+    assert db.ranking(1, offset=1)[1] == [("a", 1, 30.0)]
+
+
+def test_pending_pages_through_unprobed_recordings(recordings, db):
+    paths = sorted(segment(recordings, "a", minute) for minute in range(5))
+    db.sync(paths)
+    probed(db, paths[2], 10.0)
+    first = db.pending("", 2)
+    assert [path for path, _ in first] == paths[:2]
+    assert [path for path, _ in db.pending(first[-1][0], 2)] == paths[3:]
+
+
+def test_parse_start_accepts_trimmed_fractions():
+    for timestamp in ("2024-08-01T12:00:00.5Z", "2024-08-01T12:00:00.500000Z"):
+        assert catalog.parse_start(timestamp).microsecond == 500000
+    assert catalog.parse_start("2024-08-01T12:00:00Z").microsecond == 0
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from cryptography.fernet import InvalidToken
+
+from fernet_keyring import KeyRing, TokenExpired
+from state import SQLiteStateStore
+
+
+def run(tmp_path, test):
+    async def main():
+        store = SQLiteStateStore(str(tmp_path / "state.db"))
+        await store.connect()
+        try:
+            await test(store)
+        finally:
+            await store.close()
+
+    asyncio.run(main())
+
+
+def test_round_trip(tmp_path):
+    async def test(store):
+        keyring = KeyRing(store)
+        token = await keyring.encrypt(b"U123+42", ttl=60)
+        assert await keyring.decrypt(token) == b"U123+42"
+
+    run(tmp_path, test)
+
+
+def test_expired_token(tmp_path):
+    async def test(store):
+        keyring = KeyRing(store)
+        token = await keyring.encrypt(b"U123+42", ttl=-1)
+        with pytest.raises(TokenExpired):
+            await keyring.decrypt(token)
+
+    run(tmp_path, test)
+
+
+def test_retired_key_decrypts_during_the_overlap(tmp_path):
+    async def test(store):
+        keyring = KeyRing(store, overlap=3600)
+        token = await keyring.encrypt(b"data", ttl=60)
+        await keyring.rotate()
+        assert len(keyring.keys) == 2
+        assert await keyring.decrypt(token) == b"data"
+
+    run(tmp_path, test)
+
+
+def test_retired_key_is_dropped_after_the_overlap(tmp_path):
+    async def test(store):
+        keyring = KeyRing(store, overlap=0)
+        token = await keyring.encrypt(b"data", ttl=60)
+        await keyring.rotate()
+        assert len(keyring.keys) == 1
+        with pytest.raises(InvalidToken):
+            await keyring.decrypt(token)
+
+    run(tmp_path, test)
+
+
+def test_workers_share_rotated_keys(tmp_path):
+    async def test(store):
+        first = KeyRing(store)
+        second = KeyRing(store)
+        await second.load()
+        await first.rotate()
+        # second still has the old keyring cached, and reloads on a miss
+        token = await first.encrypt(b"data", ttl=60)
+        assert await second.decrypt(token) == b"data"
+
+    run(tmp_path, test)
@@ -0,0 +1,90 @@
+from focus import FocusScheduler
+
+
+def scheduler(*names: str, slot_seconds: float = 300.0) -> FocusScheduler:
+    focus = FocusScheduler(slot_seconds=slot_seconds)
+    for name in names:
+        focus.add(name)
+    return focus
+
+
+def test_least_airtime_goes_first():
+    focus = scheduler("a", "b", "c")
+    focus.load("a", 600, 0)
+    focus.load("b", 60, 0)
+    focus.load("c", 300, 0)
+    assert focus.pick(1000) == "b"
+
+
+def test_ties_go_to_whoever_waited_longest():
+    focus = scheduler("a", "b")
+    focus.load("a", 0, 500)
+    focus.load("b", 0, 100)
+    assert focus.pick(1000) == "b"
+
+
+def test_release_adds_airtime():
+    focus = scheduler("a", "b")
+    assert focus.pick(1000) == "a"
+    assert focus.pick(1300) == "b"
+    assert focus.airtime["a"].seconds == 300
+    assert focus.airtime["a"].last_focused == 1300
+    # a has had its turn, b hasn't finished one
+    assert focus.pick(1400) == "a"
+    assert focus.airtime["b"].seconds == 100
+
+
+def test_ineligible_streams_keep_their_place():
+    focus = scheduler("a", "b", "c")
+    assert focus.pick(0, lambda name: name != "a") == "b"
+    assert focus.pick(10) == "a"
+
+
+def test_keeps_focus_when_nobody_else_can_take_it():
+    focus = scheduler("a", "b")
+    assert focus.pick(0) == "a"
+    assert focus.pick(10, lambda name: name == "a") == "a"
+    assert focus.focused_since == 0
+
+
+def test_removed_streams_are_never_picked():
+    focus = scheduler("a", "b")
+    focus.remove("a", 0)
+    assert focus.pick(0) == "b"
+    assert focus.pick(10) == "b"
+
+
+def test_removing_the_focused_stream_ends_its_slot():
+    focus = scheduler("a", "b")
+    focus.pick(0)
+    focus.remove("a", 50)
+    assert focus.focused is None
+    assert focus.airtime["a"].seconds == 50
+
+
+def test_due_once_the_slot_has_run():
+    focus = scheduler("a", "b", slot_seconds=300)
+    assert focus.due(0)
+    focus.pick(100)
+    assert not focus.due(399)
+    assert focus.due(400)
+
+
+def test_resume_continues_a_slot():
+    focus = scheduler("b")
+    focus.resume("a", 100)
+    assert focus.focused == "a"
+    assert not focus.due(200)
+    assert focus.pick(500) == "b"
+    assert focus.airtime["a"].seconds == 400
+
+
+def test_reset_forgets_live_streams_but_keeps_airtime():
+    focus = scheduler("a", "gone")
+    focus.pick(0)
+    focus.reset()
+    assert focus.focused is None
+    assert focus.pick(0) is None
+    focus.add("a")
+    assert focus.pick(10) == "a"
+    assert "gone" in focus.airtime
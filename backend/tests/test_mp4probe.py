@@ -0,0 +1,47 @@
+import pytest
+
+import mp4probe
+from fixtures import synthetic_fmp4
+
+
+def write(tmp_path, data: bytes):
+    path = tmp_path / "segment.mp4"
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_duration_of_fragmented_segment(tmp_path):
+    # whole samples only, so the last one may run past the requested length
+    seconds = mp4probe.duration(write(tmp_path, synthetic_fmp4(10.0)))
+    assert 10.0 <= seconds < 10.0 + 1.25 / 30
+
+
+def test_duration_with_constant_frame_rate(tmp_path):
+    assert mp4probe.duration(write(tmp_path, synthetic_fmp4(4.0, vfr=False))) == pytest.approx(4.0)
+
+
+def test_keyframe_index_has_one_cut_per_fragment(tmp_path):
+    data = synthetic_fmp4(5.0, vfr=False)
+    movie = mp4probe.parse(write(tmp_path, data))
+    index = mp4probe.keyframe_index(movie)
+    assert index is not None
+    assert [seconds for seconds, _ in index.frames] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    # every cut point is a moof, and the init segment ends at the first one
+    assert index.init_size == index.frames[0][1]
+    for _, offset in index.frames:
+        assert data[offset + 4 : offset + 8] == b"moof"
+
+
+def test_truncated_segment_keeps_complete_fragments(tmp_path):
+    data = synthetic_fmp4(5.0, vfr=False)
+    cut = mp4probe.keyframe_index(mp4probe.parse(write(tmp_path, data))).frames[3][1]
+    # still being written: stops partway into the fourth fragment
+    path = write(tmp_path, data[: cut + 20])
+    assert mp4probe.duration(path) == pytest.approx(3.0)
+    assert len(mp4probe.keyframe_index(mp4probe.parse(path)).frames) == 3
+
+
+def test_empty_file(tmp_path):
+    path = write(tmp_path, b"")
+    assert mp4probe.duration(path) == 0.0
+    assert mp4probe.keyframe_index(mp4probe.parse(path)) is None
@@ -0,0 +1,74 @@
+import pytest
+
+from registry import Snapshot, StreamRegistry
+
+
+def test_add_and_remove_bump_the_version():
+    registry = StreamRegistry()
+    assert registry.add("a")
+    assert not registry.add("a")
+    assert registry.version == 1
+    assert registry.remove("a")
+    assert not registry.remove("a")
+    assert registry.version == 2
+
+
+def test_streams_stay_in_the_order_they_went_live():
+    registry = StreamRegistry()
+    for name in ("c", "a", "b"):
+        registry.add(name)
+    registry.remove("a")
+    registry.add("a")
+    assert registry.names() == ["c", "b", "a"]
+
+
+def test_snapshot_is_reused_until_something_changes():
+    registry = StreamRegistry()
+    registry.add("a")
+    first = registry.snapshot()
+    assert registry.snapshot() is first
+    registry.set_focus("a")
+    second = registry.snapshot()
+    assert second is not first
+    assert second.focused == "a"
+    # earlier snapshots don't change under their readers
+    assert first.focused is None
+
+
+def test_snapshot_membership():
+    registry = StreamRegistry()
+    registry.add("a")
+    snapshot = registry.snapshot()
+    assert "a" in snapshot
+    assert "b" not in snapshot
+
+
+def test_focus_must_be_live():
+    registry = StreamRegistry()
+    with pytest.raises(KeyError):
+        registry.set_focus("a")
+    registry.add("a")
+    registry.set_focus("a")
+    registry.remove("a")
+    assert registry.focused is None
+
+
+def test_json_round_trip():
+    registry = StreamRegistry()
+    registry.add("a")
+    registry.add("b")
+    registry.set_focus("b")
+    snapshot = registry.snapshot()
+    assert Snapshot.from_json(snapshot.to_json()) == snapshot
+
+
+def test_restore_continues_after_the_previous_leader():
+    leader = StreamRegistry()
+    leader.add("a")
+    leader.set_focus("a")
+    snapshot = leader.snapshot()
+    registry = StreamRegistry()
+    registry.restore(Snapshot.from_json(snapshot.to_json()))
+    assert registry.names() == ["a"]
+    assert registry.focused == "a"
+    assert registry.snapshot().version > snapshot.version